@@ -1,11 +1,13 @@
 from flask import Flask, request, jsonify, send_file, send_from_directory
 import logging
-from database import AlbumDatabase
+from database import AlbumDatabase, build_album_filter
 from pathlib import Path
 import os
 import requests
 from werkzeug.utils import secure_filename
-from scanner import MusicScanner
+from scanner import scan_roots, parse_music_roots
+from cover_fetcher import download_image, itunes_search_url, sniff_image_type
+from sprites import SpriteBuilder, SPRITE_TILE_SIZES, MAX_SPRITE_TILES
 
 app = Flask(__name__, static_folder='frontend/dist', template_folder='frontend/dist')
 # Reduce default logging noise
@@ -14,6 +16,8 @@ app.logger.setLevel(logging.WARNING)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config.setdefault('DB_PATH', 'albums.db')
 
+MAX_PER_PAGE = 500  # largest album page a single request may ask for
+
 # Lazy initialization - db will be created when first accessed
 _db = None
 
@@ -25,6 +29,31 @@ def get_db():
         _db = AlbumDatabase(db_path)
     return _db
 
+# Lazy initialization - sprite cache directory is created on first sprite request
+_sprite_builder = None
+
+def get_sprite_builder():
+    """Get or create the sprite sheet builder"""
+    global _sprite_builder
+    if _sprite_builder is None:
+        _sprite_builder = SpriteBuilder(app.config.get('SPRITES_DIR', 'sprites'))
+    return _sprite_builder
+
+# Background cover fetcher (started by main.run_server); served pages are bumped to the front
+_cover_scheduler = None
+
+def set_cover_scheduler(scheduler):
+    """Register the background cover fetcher that /api/albums reports visible albums to"""
+    global _cover_scheduler
+    _cover_scheduler = scheduler
+
+def get_music_roots():
+    """Get the configured music roots (MUSIC_ROOTS list, or os.pathsep-separated MUSIC_ROOT)"""
+    if app.config.get('MUSIC_ROOTS'):
+        return list(app.config['MUSIC_ROOTS'])
+    music_root = app.config.get('MUSIC_ROOT', os.environ.get('MUSIC_ROOT', r"D:\\Music"))
+    return parse_music_roots(music_root)
+
 # Create covers directory if it doesn't exist
 covers_dir = Path("covers")
 covers_dir.mkdir(exist_ok=True)
@@ -34,35 +63,58 @@ def index():
     """Main page displaying all albums"""
     return send_from_directory('frontend/dist', 'index.html')
 
-@app.route('/api/albums')
-def get_albums():
-    """API endpoint to get all albums"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 100, type=int)
+def _get_albums_page():
+    """Apply the search/filter/pagination query args shared by the album list endpoints.
+    
+    Returns:
+        (albums on the requested page, total matching albums, page, per_page)
+    """
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', 100, type=int)), MAX_PER_PAGE)
     search = request.args.get('search', '', type=str)
     filter_shared = request.args.get('filter_shared', '', type=str)
     
-    albums = get_db().get_all_albums()
+    # Always exclude shared unless 'shared' is explicitly requested;
+    # facet filters (genre, artist, decade) are applied in SQL
+    where, params = build_album_filter(
+        shared=filter_shared == 'shared',
+        genre=request.args.get('genre', '', type=str),
+        artist=request.args.get('artist', '', type=str),
+        decade=request.args.get('decade', None, type=int)
+    )
+    start = (page - 1) * per_page
+    end = start + per_page
     
-    # Apply filters
-    if search:
-        search_lower = search.lower()
-        albums = [a for a in albums if 
-                 search_lower in a['artist'].lower() or 
-                 search_lower in a['album'].lower() or
-                 (a['genre'] and search_lower in a['genre'].lower())]
+    if not search:
+        # Pagination in SQL: only the requested page is read
+        total = get_db().count_albums(where, params)
+        albums_page = [a._asdict() for a in get_db().iter_albums(
+            where=where, params=params, order_by="display_order", limit=per_page, offset=start
+        )]
+        return albums_page, total, page, per_page
     
-    # Always exclude shared unless 'shared' is explicitly requested
-    if filter_shared == 'shared':
-        albums = [a for a in albums if a['shared']]
-    else:
-        albums = [a for a in albums if not a['shared']]
+    # Stream rows in display order, keeping only the requested page in memory
+    search_lower = search.lower()
+    total = 0
+    albums_page = []
+    for a in get_db().iter_albums(where=where, params=params, order_by="display_order"):
+        if search and not (search_lower in a.artist.lower() or
+                           search_lower in a.album.lower() or
+                           (a.genre and search_lower in a.genre.lower())):
+            continue
+        if start <= total < end:
+            albums_page.append(a._asdict())
+        total += 1
     
-    # Pagination
-    total = len(albums)
-    start = (page - 1) * per_page
-    end = start + per_page
-    albums_page = albums[start:end]
+    return albums_page, total, page, per_page
+
+@app.route('/api/albums')
+def get_albums():
+    """API endpoint to get all albums"""
+    albums_page, total, page, per_page = _get_albums_page()
+    
+    if _cover_scheduler is not None:
+        _cover_scheduler.bump(albums_page)
     
     return jsonify({
         'albums': albums_page,
@@ -72,12 +124,171 @@ def get_albums():
         'total_pages': (total + per_page - 1) // per_page
     })
 
+@app.route('/api/facets')
+def get_facets():
+    """Album counts per genre, artist and release decade.
+    Like /api/albums, shared albums are excluded unless filter_shared=shared;
+    limit keeps the largest buckets."""
+    filter_shared = request.args.get('filter_shared', '', type=str)
+    shared = filter_shared == 'shared'
+    limit = request.args.get('limit', None, type=int)
+    if limit is not None:
+        limit = max(1, limit)
+    return jsonify(get_db().get_facets(shared=shared, limit=limit))
+
+@app.route('/api/albums/sprite')
+def get_albums_sprite():
+    """Sprite sheet for the covers of an /api/albums page (same query args plus tile size).
+    Returns the sprite URL and an album id -> [x, y] offset map."""
+    tile_size = request.args.get('size', 128, type=int)
+    if tile_size not in SPRITE_TILE_SIZES:
+        return jsonify({'error': f'Unsupported tile size, use one of {sorted(SPRITE_TILE_SIZES)}'}), 400
+    if request.args.get('per_page', 100, type=int) > MAX_SPRITE_TILES:
+        return jsonify({'error': f'per_page must be at most {MAX_SPRITE_TILES} for sprites'}), 400
+    
+    albums_page, _, page, per_page = _get_albums_page()
+    sprite = get_sprite_builder().get_sprite(albums_page, tile_size)
+    
+    return jsonify({
+        'url': f"/sprites/{sprite['sprite']}",
+        'page': page,
+        'per_page': per_page,
+        **sprite
+    })
+
+@app.route('/sprites/<name>')
+def serve_sprite(name):
+    """Serve a cached sprite sheet; names are content hashes, so they never change"""
+    path = get_sprite_builder().sprite_path(name)
+    if path is None:
+        return jsonify({'error': 'Sprite not found'}), 404
+    return send_file(path, max_age=31536000)
+
 @app.route('/api/albums/<int:album_id>/toggle_shared', methods=['POST'])
 def toggle_shared(album_id):
     """Toggle the shared status of an album"""
     get_db().toggle_shared(album_id)
     return jsonify({'success': True})
 
+def _parse_album_ids(value):
+    """Validate a JSON list of album ids"""
+    if not isinstance(value, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in value):
+        return None
+    return value
+
+@app.route('/api/albums/shared', methods=['POST'])
+def set_shared():
+    """Set (not toggle) the shared status of many albums in one transaction.
+    
+    JSON body: {"shared": true, "ids": [1, 2, 3]}
+           or {"shared": true, "filter": {"artist": "...", "genre": "...", "decade": 1990, "filter_shared": "not_shared"}}
+    Returns per-id results so a whole page or artist can be marked in one round trip.
+    """
+    data = request.get_json(silent=True) or {}
+    shared = data.get('shared')
+    if not isinstance(shared, bool):
+        return jsonify({'success': False, 'error': "'shared' must be true or false"}), 400
+    
+    if 'ids' in data:
+        album_ids = _parse_album_ids(data['ids'])
+        if album_ids is None:
+            return jsonify({'success': False, 'error': "'ids' must be a list of album ids"}), 400
+        found = get_db().set_shared(album_ids, shared)
+        results = [
+            {'id': album_id, 'success': True} if found[album_id]
+            else {'id': album_id, 'success': False, 'error': 'Album not found'}
+            for album_id in album_ids
+        ]
+    elif isinstance(data.get('filter'), dict):
+        album_filter = data['filter']
+        filter_shared = album_filter.get('filter_shared', '')
+        decade = album_filter.get('decade')
+        if decade is not None and (not isinstance(decade, int) or isinstance(decade, bool)):
+            return jsonify({'success': False, 'error': "'decade' must be a year such as 1990"}), 400
+        genre = album_filter.get('genre')
+        artist = album_filter.get('artist')
+        for name, value in (('genre', genre), ('artist', artist), ('filter_shared', filter_shared)):
+            if value is not None and not isinstance(value, str):
+                return jsonify({'success': False, 'error': f"'{name}' must be a string"}), 400
+        where, params = build_album_filter(
+            shared={'shared': True, 'not_shared': False}.get(filter_shared),
+            genre=genre,
+            artist=artist,
+            decade=decade
+        )
+        if not where:
+            return jsonify({'success': False, 'error': 'Filter must restrict at least one field'}), 400
+        album_ids = get_db().set_shared_where(shared, where, params)
+        results = [{'id': album_id, 'success': True} for album_id in album_ids]
+    else:
+        return jsonify({'success': False, 'error': "Provide 'ids' or 'filter'"}), 400
+    
+    return jsonify({
+        'success': True,
+        'updated': sum(1 for r in results if r['success']),
+        'results': results
+    })
+
+def _cover_path_error(cover_path, folder_path):
+    """Why cover_path cannot be an album's cover, or None if it can.
+    Covers must be images in the covers directory or in the album's own folder."""
+    path = Path(cover_path).resolve()
+    if not any(path.is_relative_to(Path(directory).resolve()) for directory in (covers_dir, folder_path)):
+        return 'Cover must be in the covers directory or the album folder'
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(16)
+    except OSError:
+        return 'Cover file not found'
+    if sniff_image_type(header) is None:
+        return 'Cover file is not a supported image'
+    return None
+
+@app.route('/api/albums/covers', methods=['POST'])
+def update_covers():
+    """Set the cover path of many albums in one transaction.
+    
+    JSON body: {"covers": [{"id": 1, "cover_path": "covers/album_1.jpg"}, ...]}
+    Returns per-id results.
+    """
+    data = request.get_json(silent=True) or {}
+    covers = data.get('covers')
+    if not isinstance(covers, list):
+        return jsonify({'success': False, 'error': "'covers' must be a list"}), 400
+    
+    entries = [(entry.get('id'), entry.get('cover_path')) if isinstance(entry, dict) else (None, None)
+               for entry in covers]
+    folder_paths = get_db().get_folder_paths(
+        [album_id for album_id, _ in entries if isinstance(album_id, int) and not isinstance(album_id, bool)]
+    )
+    
+    results = []
+    valid = []
+    for album_id, cover_path in entries:
+        if not isinstance(album_id, int) or isinstance(album_id, bool) or not isinstance(cover_path, str) or not cover_path:
+            results.append({'id': album_id, 'success': False, 'error': "Each entry needs an 'id' and a 'cover_path'"})
+            continue
+        if album_id not in folder_paths:
+            error = 'Album not found'
+        else:
+            error = _cover_path_error(cover_path, folder_paths[album_id])
+        if error:
+            results.append({'id': album_id, 'success': False, 'error': error})
+        else:
+            valid.append((album_id, cover_path))
+            results.append({'id': album_id, 'success': True})
+    
+    found = get_db().update_cover_paths(valid)
+    for result in results:
+        if result['success'] and not found.get(result['id']):
+            result.update(success=False, error='Album not found')
+    
+    return jsonify({
+        'success': True,
+        'updated': sum(1 for r in results if r['success']),
+        'results': results
+    })
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint for Vercel"""
@@ -86,15 +297,21 @@ def health_check():
 @app.route('/api/stats')
 def get_stats():
     """Get statistics about the collection"""
-    albums = get_db().get_all_albums()
+    total_albums = 0
+    shared_albums = 0
+    albums_with_covers = 0
+    artists = set()
+    
+    for a in get_db().iter_albums(columns=('artist', 'shared', 'cover_path')):
+        total_albums += 1
+        shared_albums += 1 if a.shared else 0
+        albums_with_covers += 1 if a.cover_path else 0
+        artists.add(a.artist)
     
-    total_albums = len(albums)
-    shared_albums = sum(1 for a in albums if a['shared'])
-    albums_with_covers = sum(1 for a in albums if a['cover_path'])
     albums_without_covers = total_albums - albums_with_covers
     
     # Count unique artists
-    unique_artists = len(set(a['artist'] for a in albums))
+    unique_artists = len(artists)
     
     return jsonify({
         'total_albums': total_albums,
@@ -109,11 +326,12 @@ def get_stats():
 def rescan():
     """Rescan the music library and add any new albums.
     Existing albums are skipped (unique folder_path), preserving any cover_path set manually or via API.
+    Pass resume=1 to continue an interrupted scan from its checkpoint.
     """
-    music_root = app.config.get('MUSIC_ROOT', os.environ.get('MUSIC_ROOT', r"D:\\Music"))
-    scanner = MusicScanner(music_root, get_db())
-    added, skipped = scanner.scan()
-    return jsonify({'success': True, 'added': added, 'skipped': skipped})
+    music_roots = get_music_roots()
+    resume = request.args.get('resume', '').lower() in {'1', 'true', 'yes'}
+    added, skipped, root_stats = scan_roots(music_roots, get_db(), resume=resume)
+    return jsonify({'success': True, 'added': added, 'skipped': skipped, 'roots': root_stats})
 
 @app.route('/api/albums/<int:album_id>/update_cover', methods=['POST'])
 def update_cover(album_id):
@@ -146,23 +364,11 @@ def update_cover(album_id):
             if not url:
                 return jsonify({'success': False, 'error': 'No URL provided'}), 400
             
-            # Download image from URL
-            response = requests.get(url, timeout=15)
-            response.raise_for_status()
-            
-            # Determine file extension from URL or content type
-            ext = '.jpg'
-            if '.' in url:
-                ext = '.' + url.rsplit('.', 1)[-1].split('?')[0].lower()
-                if ext not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-                    ext = '.jpg'
-            
-            filename = f"album_{album_id}_downloaded{ext}"
-            filepath = covers_dir / filename
-            
-            # Save downloaded image
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            # Download image from URL (streamed, size-capped, type sniffed from content)
+            try:
+                filepath = download_image(url, covers_dir / f"album_{album_id}_downloaded")
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
             
             # Update database
             get_db().update_cover_path(album_id, str(filepath))
@@ -171,15 +377,14 @@ def update_cover(album_id):
         
         elif cover_source == 'api':
             # Fetch from iTunes API
-            albums = get_db().get_all_albums()
-            album = next((a for a in albums if a['id'] == album_id), None)
+            album = next(get_db().iter_albums(columns=('artist', 'album'), where="id = ?", params=(album_id,)), None)
             
             if not album:
                 return jsonify({'success': False, 'error': 'Album not found'}), 404
             
             # Search iTunes API
-            search_term = f"{album['artist']} {album['album']}"
-            api_url = "https://itunes.apple.com/search"
+            search_term = f"{album.artist} {album.album}"
+            api_url = itunes_search_url(app.config.get('ITUNES_BASE_URL'))
             params = {
                 'term': search_term,
                 'media': 'music',
@@ -204,14 +409,10 @@ def update_cover(album_id):
             artwork_url = artwork_url.replace('100x100', '600x600')
             
             # Download image
-            img_response = requests.get(artwork_url, timeout=15)
-            img_response.raise_for_status()
-            
-            filename = f"album_{album_id}_itunes.jpg"
-            filepath = covers_dir / filename
-            
-            with open(filepath, 'wb') as f:
-                f.write(img_response.content)
+            try:
+                filepath = download_image(artwork_url, covers_dir / f"album_{album_id}_itunes")
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
             
             # Update database
             get_db().update_cover_path(album_id, str(filepath))
@@ -234,7 +435,8 @@ def serve_cover(cover_path):
         # Relative path from app directory
         full_path = Path(cover_path)
         if full_path.exists():
-            return send_file(full_path)
+            # send_file resolves relative paths against the app root, not the working directory
+            return send_file(full_path.resolve())
     
     # Return placeholder if cover not found (use a generic image or return 404)
     # For now, just return 404 if cover doesn't exist
@@ -250,9 +452,9 @@ def serve_static_file(path):
 
 @app.route('/assets/<path:filename>')
 def serve_assets(filename):
-    """Serve React assets"""
+    """Serve React assets (file names are content-hashed by Vite, so they can be cached forever)"""
     try:
-        return send_from_directory('frontend/dist/assets', filename)
+        return send_from_directory('frontend/dist/assets', filename, max_age=31536000)
     except:
         return jsonify({'error': 'Asset not found'}), 404
 
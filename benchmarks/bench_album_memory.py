@@ -0,0 +1,111 @@
+"""
+Peak memory of the album list/stats endpoints at a large library size.
+
+Compares the old list-of-dict materialization (get_all_albums + Python
+filtering) with the streaming iter_albums() path now used by /api/albums and
+/api/stats. Each mode runs in a fresh subprocess so peak RSS is not shared.
+
+    python benchmarks/bench_album_memory.py [album_count]
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path so we can import app modules
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from database import AlbumDatabase
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    try:
+        import resource
+    except ImportError:  # Windows: fall back to the Python heap peak
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)
+
+
+def build_database(db_path: str, album_count: int):
+    """Create a synthetic library with album_count albums"""
+    AlbumDatabase(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executemany("""
+        INSERT INTO albums (genre, artist, album, release_date, cover_path, shared, display_order, folder_path)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (f"Genre {i % 40}", f"Artist {i % 9000}", f"Album {i}", str(1960 + i % 60),
+         f"covers/album_{i}_itunes.jpg" if i % 3 else None, 1 if i % 10 == 0 else 0, i,
+         os.path.join("Music", f"g{i % 40}", f"Artist {i % 9000}", f"Album {i}"))
+        for i in range(album_count)
+    ))
+    conn.commit()
+    conn.close()
+
+
+def run_before(db: AlbumDatabase):
+    """Baseline: materialize every row as a dict, as the endpoints used to"""
+    albums = db.get_all_albums()
+    albums = [a for a in albums if not a['shared']]
+    page = albums[:100]
+    
+    albums = db.get_all_albums()
+    stats = (len(albums), sum(1 for a in albums if a['shared']),
+             sum(1 for a in albums if a['cover_path']), len(set(a['artist'] for a in albums)))
+    return len(page), stats
+
+
+def run_after(db: AlbumDatabase):
+    """Streaming path used by /api/albums and /api/stats"""
+    from app import app
+    app.config['DB_PATH'] = db.db_path
+    client = app.test_client()
+    page = client.get('/api/albums?page=1&per_page=100').get_json()
+    stats = client.get('/api/stats').get_json()
+    return len(page['albums']), stats
+
+
+def run_mode(mode: str, db_path: str):
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        import tracemalloc
+        tracemalloc.start()
+    
+    # Import Flask up front so its footprint is part of the startup baseline
+    from app import app  # noqa: F401
+    
+    db = AlbumDatabase(db_path)
+    baseline = peak_rss_mb()
+    start = time.time()
+    run_before(db) if mode == 'before' else run_after(db)
+    elapsed = time.time() - start
+    peak = peak_rss_mb()
+    print(f"{mode:>6}: peak RSS {peak:7.1f} MB (+{peak - baseline:6.1f} MB over startup), {elapsed:.2f}s")
+
+
+def main():
+    album_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        print(f"Building synthetic library with {album_count} albums...")
+        build_database(db_path, album_count)
+        
+        for mode in ('before', 'after'):
+            subprocess.run([sys.executable, __file__, '--mode', mode, db_path], check=True, cwd=parent_dir)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,133 @@
+"""
+Offline load test of the cover fetch pipeline against a fake iTunes service.
+
+Starts benchmarks/fake_itunes.py in-process, builds a synthetic library whose
+albums are partly missing covers, and drives CoverFetcher.fetch_missing_covers
+plus the /api/albums/<id>/update_cover 'api' and 'url' paths against it.
+Reports covers/sec, retries, failures and per-album latency percentiles, with
+no network access needed.
+
+    python benchmarks/bench_cover_fetch.py [--albums 1000] [--latency 0.02] [--rate-limit 0.05] [--error-rate 0.02]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path so we can import app modules
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from cover_fetcher import CoverFetcher
+from database import AlbumDatabase, MISSING_COVER
+from bench_album_memory import build_database
+from bench_server_load import percentile
+from fake_itunes import FakeItunesServer, add_config_arguments, config_from_args
+
+
+def report(label: str, covers: int, failed: int, retries: int, latencies, elapsed: float):
+    print(f"{label:>16} {covers:>7} {failed:>7} {retries:>8} {covers / elapsed:>10.1f} "
+          f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+          f"{percentile(latencies, 99) * 1000:>8.1f}")
+
+
+def run_fetcher(db: AlbumDatabase, base_url: str, covers_dir: str, limit: int, args):
+    """Drive fetch_missing_covers; per-album latency is search + download time"""
+    fetcher = CoverFetcher(db, base_url=base_url, covers_dir=covers_dir)
+    fetcher.retry_backoff = args.retry_backoff
+    latencies = []
+    started = {}
+    search_itunes, download_cover = fetcher.search_itunes, fetcher.download_cover
+    
+    def timed_search(artist, album):
+        started[(artist, album)] = time.perf_counter()
+        url = search_itunes(artist, album)
+        if not url:
+            latencies.append(time.perf_counter() - started.pop((artist, album)))
+        return url
+    
+    def timed_download(url, album_id, artist, album):
+        try:
+            return download_cover(url, album_id, artist, album)
+        finally:
+            latencies.append(time.perf_counter() - started.pop((artist, album)))
+    
+    fetcher.search_itunes, fetcher.download_cover = timed_search, timed_download
+    
+    missing_before = db.count_albums(MISSING_COVER)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # per-album progress lines
+        fetcher.fetch_missing_covers(limit=limit, delay=args.delay)
+    elapsed = time.perf_counter() - start
+    covers = missing_before - db.count_albums(MISSING_COVER)
+    report('fetch_missing', covers, min(limit, missing_before) - covers, fetcher.retry_count, latencies, elapsed)
+
+
+def run_update_cover(db: AlbumDatabase, base_url: str, db_path: str, source: str, limit: int):
+    """POST update_cover for albums still missing covers ('api' searches, 'url' downloads directly)"""
+    from app import app
+    app.config['DB_PATH'] = db_path
+    app.config['ITUNES_BASE_URL'] = base_url
+    client = app.test_client()
+    
+    album_ids = [row.id for row in db.iter_albums(columns=('id',), where=MISSING_COVER, limit=limit)]
+    latencies = []
+    covers = 0
+    start = time.perf_counter()
+    for album_id in album_ids:
+        form = {'source': source}
+        if source == 'url':
+            form['url'] = f"{base_url}/image/{album_id}/600x600bb.jpg"
+        request_start = time.perf_counter()
+        response = client.post(f"/api/albums/{album_id}/update_cover", data=form)
+        latencies.append(time.perf_counter() - request_start)
+        covers += response.status_code == 200
+    elapsed = time.perf_counter() - start
+    # The endpoint has no retry loop: every 429/500 is a failed request
+    report(f"update_cover:{source}", covers, len(album_ids) - covers, 0, latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--albums', type=int, default=1000, help="synthetic library size (1/3 miss covers)")
+    parser.add_argument('--limit', type=int, default=100, help="albums fetched per phase")
+    parser.add_argument('--delay', type=float, default=0.0, help="fetch_missing_covers delay between albums")
+    parser.add_argument('--retry-backoff', type=float, default=0.05, help="fetcher backoff when no Retry-After")
+    add_config_arguments(parser)
+    parser.set_defaults(latency=0.02, jitter=0.01, rate_limit=0.05, error_rate=0.02,
+                        not_found_rate=0.05, retry_after=0.05)
+    args = parser.parse_args()
+    
+    server = FakeItunesServer(config_from_args(args))
+    server.start()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The app saves covers relative to the working directory
+        os.chdir(tmp_dir)
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        print(f"Building synthetic library with {args.albums} albums...")
+        build_database(db_path, args.albums)
+        db = AlbumDatabase(db_path)
+        print(f"Fake iTunes at {server.base_url}: latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, "
+              f"{args.rate_limit:.0%} 429, {args.error_rate:.0%} 500, {args.not_found_rate:.0%} not found, "
+              f"{args.image_kb} KB images\n")
+        
+        print(f"{'phase':>16} {'covers':>7} {'failed':>7} {'retries':>8} {'covers/s':>10} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        run_fetcher(db, server.base_url, os.path.join(tmp_dir, 'covers'), args.limit, args)
+        for source in ('api', 'url'):
+            run_update_cover(db, server.base_url, db_path, source, args.limit)
+        
+        os.chdir(parent_dir)
+    
+    server.shutdown()
+    server.server_close()
+    print(f"\nServer responses: {dict(sorted(server.counts.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Load test of the serving modes in main.run_server (SERVER=dev|threaded|prefork).
+
+Starts `python main.py` against a synthetic library for each mode and hammers
+it with concurrent clients mimicking the grid: one /api/albums page request
+followed by cover requests for the tiles on it. Reports requests/sec and
+latency percentiles per mode.
+
+    python benchmarks/bench_server_load.py [--clients 32] [--seconds 15] [--modes dev,threaded,prefork] [--cover-fetch]
+
+With --cover-fetch, a third of the albums have no cover and each server runs
+its background cover fetcher against a local fake iTunes service
+(benchmarks/fake_itunes.py), so the load includes cover fetching.
+"""
+import argparse
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+# Add parent directory to path so we can import app modules
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from bench_album_memory import build_database
+from fake_itunes import FakeItunesServer, FakeItunesConfig
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def start_server(mode: str, db_path: str, music_root: str, port: int, threads: int, workers: int,
+                 itunes_base_url: str = None) -> subprocess.Popen:
+    env = dict(os.environ,
+               SERVER=mode, DB_PATH=db_path, MUSIC_ROOT=music_root, HOST='127.0.0.1', PORT=str(port),
+               SERVER_THREADS=str(threads), SERVER_WORKERS=str(workers), ENABLE_WATCHER='false',
+               ENABLE_COVER_FETCH='true' if itunes_base_url else 'false', ITUNES_BASE_URL=itunes_base_url or '')
+    # Run from the library directory: covers (served and fetched) are relative to it
+    process = subprocess.Popen([sys.executable, os.path.join(parent_dir, 'main.py')], cwd=music_root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server in mode '{mode}' did not start")
+
+
+def run_load(base_url: str, clients: int, seconds: float, total_pages: int):
+    """Run clients concurrently for the given duration; returns (latencies, errors, elapsed)"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + seconds
+    
+    def client():
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.time() < stop_at:
+            page = random.randint(1, total_pages)
+            urls = [f"{base_url}/api/albums?page={page}&per_page=100"]
+            start = time.perf_counter()
+            try:
+                response = session.get(urls[0], timeout=30)
+                response.raise_for_status()
+                local_latencies.append(time.perf_counter() - start)
+                urls = [f"{base_url}/cover/{quote(a['cover_path'], safe='')}"
+                        for a in response.json()['albums'] if a['cover_path']]
+            except requests.RequestException:
+                local_errors += 1
+                continue
+            
+            for url in urls:
+                if time.time() >= stop_at:
+                    break
+                start = time.perf_counter()
+                try:
+                    session.get(url, timeout=30).raise_for_status()
+                    local_latencies.append(time.perf_counter() - start)
+                except requests.RequestException:
+                    local_errors += 1
+        
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+    
+    start = time.time()
+    workers = [threading.Thread(target=client) for _ in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, errors[0], time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--albums', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4)
+    default_modes = 'dev,threaded' if sys.platform == 'win32' else 'dev,threaded,prefork'
+    parser.add_argument('--modes', default=default_modes)
+    parser.add_argument('--cover-fetch', action='store_true', help="run the background cover fetcher too")
+    args = parser.parse_args()
+    
+    itunes = None
+    if args.cover_fetch:
+        itunes = FakeItunesServer(FakeItunesConfig(latency=0.05, jitter=0.02))
+        itunes.start()
+    
+    # Every synthetic album points at one of the real covers in the repo
+    # (relative to the server's working directory, like fetched covers)
+    covers = sorted(f"covers/{f}" for f in os.listdir(os.path.join(parent_dir, 'covers')) if f.endswith('.jpg'))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        print(f"Building synthetic library with {args.albums} albums...")
+        build_database(db_path, args.albums)
+        shutil.copytree(os.path.join(parent_dir, 'covers'), os.path.join(tmp_dir, 'covers'))
+        conn = sqlite3.connect(db_path)
+        conn.executemany("UPDATE albums SET cover_path = ? WHERE id = ?",
+                         ((None if args.cover_fetch and i % 3 == 0 else covers[i % len(covers)], i)
+                          for i in range(1, args.albums + 1)))
+        conn.commit()
+        conn.close()
+        total_pages = max(1, int(args.albums * 0.9) // 100)
+        
+        print(f"{args.clients} clients, {args.seconds:.0f}s per mode\n")
+        print(f"{'mode':>9} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for mode in args.modes.split(','):
+            port = free_port()
+            try:
+                server = start_server(mode, db_path, tmp_dir, port, args.threads, args.workers,
+                                      itunes.base_url if itunes else None)
+            except (RuntimeError, OSError) as e:
+                print(f"{mode:>9} skipped: {e}")
+                continue
+            try:
+                latencies, errors, elapsed = run_load(f"http://127.0.0.1:{port}", args.clients, args.seconds, total_pages)
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+            print(f"{mode:>9} {len(latencies):>9} {len(latencies) / elapsed:>8.0f} "
+                  f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} {errors:>7}")
+            if itunes:
+                print(f"{'':>9} background cover fetcher: {itunes.counts['search_ok']} searches, "
+                      f"{itunes.counts['image_ok']} downloads")
+                itunes.counts.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Fast tag probe (tag_probe.probe_tags) vs. full mutagen parsing in the scanner.
+
+Builds a synthetic library of album folders (MP3 with ID3v2 or ID3v1 tags,
+FLAC with a large embedded picture ahead of the Vorbis comment, with and
+without a leading ID3 tag, M4A, Ogg Vorbis, untagged WAV and broken files),
+then times MusicScanner.get_metadata_from_folder over every folder in both
+modes and checks that the fast probe returns the same (genre, release_date)
+as a full parse for every single file.
+
+    python benchmarks/bench_tag_probe.py [--albums 36] [--tracks 6] [--track-kb 512]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mutagen.flac import Picture
+from mutagen.id3 import ID3, TCON, TDRC, APIC
+from mutagen.ogg import OggPage
+from mutagen._vorbis import VCommentDict
+
+# Add parent directory to path so we can import app modules
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from scanner import MusicScanner
+from tag_probe import NO_TAG_EXTENSIONS
+
+GENRES = ['Rock', 'Jazz', 'Electronic', 'Classical', 'Hip-Hop', 'Folk']
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417-byte frames
+MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+def mp3_audio(size: int) -> bytes:
+    return MP3_FRAME * max(1, size // len(MP3_FRAME))
+
+
+def write_mp3(path: Path, genre: str, date: str, size: int, picture_kb: int = 64):
+    path.write_bytes(mp3_audio(size))
+    tags = ID3()
+    tags.add(TCON(encoding=3, text=[genre]))
+    tags.add(TDRC(encoding=3, text=[date]))
+    tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='cover', data=os.urandom(picture_kb * 1024)))
+    tags.save(path)
+
+
+def write_mp3_v1(path: Path, genre_index: int, year: str, size: int):
+    # Bare frames with an ID3v1 tag at the end (no ID3v2 header)
+    tag = b'TAG' + b'Title'.ljust(30, b'\0') + b'Artist'.ljust(30, b'\0') + b'Album'.ljust(30, b'\0')
+    tag += year.encode().ljust(4, b'\0') + b'\0' * 30 + bytes([genre_index])
+    path.write_bytes(mp3_audio(size) + tag)
+
+
+def flac_block(block_type: int, data: bytes, last: bool = False) -> bytes:
+    return bytes([block_type | (0x80 if last else 0)]) + len(data).to_bytes(3, 'big') + data
+
+
+def write_flac(path: Path, genre: str, date: str, size: int, picture_kb: int = 512):
+    # STREAMINFO: 44.1 kHz, stereo, 16 bit, 10 s
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\x00' * 6
+    streaminfo += ((44100 << 44) | (1 << 41) | (15 << 36) | 441000).to_bytes(8, 'big') + b'\x00' * 16
+    picture = Picture()
+    picture.type = 3
+    picture.mime = 'image/jpeg'
+    picture.data = os.urandom(picture_kb * 1024)
+    comment = VCommentDict()
+    comment['genre'] = [genre]
+    comment['date'] = [date]
+    path.write_bytes(b'fLaC' + flac_block(0, streaminfo) + flac_block(6, picture.write())
+                     + flac_block(4, comment.write(framing=False), last=True) + os.urandom(size))
+
+
+def write_flac_id3(path: Path, genre: str, date: str, size: int):
+    # Some taggers put an ID3 tag ahead of the FLAC stream; mutagen ignores it
+    write_flac(path, genre, date, size)
+    tags = ID3()
+    tags.add(TCON(encoding=3, text=['Stale ID3 genre']))
+    tags.save(path)
+
+
+def mp4_atom(name: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), name) + payload
+
+
+def write_m4a(path: Path, genre: str, date: str, size: int):
+    def item(name, text):
+        return mp4_atom(name, mp4_atom(b'data', b'\x00\x00\x00\x01\x00\x00\x00\x00' + text.encode()))
+    ilst = mp4_atom(b'ilst', item(b'\xa9gen', genre) + item(b'\xa9day', date))
+    hdlr = mp4_atom(b'hdlr', b'\x00' * 8 + b'mdirappl' + b'\x00' * 9)
+    meta = mp4_atom(b'meta', b'\x00' * 4 + hdlr + ilst)
+    mvhd = mp4_atom(b'mvhd', b'\x00' * 12 + struct.pack('>II', 1000, 10000) + b'\x00' * 80)
+    path.write_bytes(mp4_atom(b'ftyp', b'M4A \x00\x00\x00\x00M4A mp42isom')
+                     + mp4_atom(b'moov', mvhd + mp4_atom(b'udta', meta)) + mp4_atom(b'mdat', os.urandom(size)))
+
+
+def write_ogg(path: Path, genre: str, date: str, size: int):
+    ident = b'\x01vorbis' + struct.pack('<IBIiii', 0, 2, 44100, 0, 128000, 0) + b'\xb8\x01'
+    comment = VCommentDict()
+    comment['genre'] = [genre]
+    comment['date'] = [date]
+    setup = b'\x05vorbis' + b'\x00' * 32
+    first = OggPage()
+    first.packets = [ident]
+    first.first = True
+    pages = [first] + OggPage.from_packets([b'\x03vorbis' + comment.write(), setup], sequence=1)
+    audio = OggPage.from_packets([os.urandom(size)], sequence=len(pages), default_size=32 * 1024)
+    audio[-1].last = True
+    audio[-1].position = 441000
+    for page in pages + audio:
+        page.serial = 1
+    path.write_bytes(b''.join(page.write() for page in pages + audio))
+
+
+def write_wav(path: Path, size: int):
+    header = struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + size, b'WAVE', b'fmt ', 16, 1, 2, 44100,
+                         44100 * 4, 4, 16, b'data', size)
+    path.write_bytes(header + b'\x00' * size)
+
+
+def build_library(root: Path, albums: int, tracks: int, track_size: int):
+    """Create album folders cycling through the file layouts the probe handles"""
+    layouts = ['mp3', 'mp3v1', 'flac', 'flac+id3', 'm4a', 'ogg', 'wav+mp3', 'wav', 'broken']
+    rng = random.Random(42)
+    for i in range(albums):
+        layout = layouts[i % len(layouts)]
+        folder = root / f"Genre {i % 5}" / f"Artist {i}" / f"Album {i} ({layout})"
+        folder.mkdir(parents=True)
+        genre_index = rng.randrange(len(GENRES))
+        genre, date = GENRES[genre_index], str(1960 + rng.randrange(60))
+        for t in range(tracks):
+            name = f"{t + 1:02d} Track"
+            if layout == 'mp3':
+                write_mp3(folder / f"{name}.mp3", genre, date, track_size)
+            elif layout == 'mp3v1':
+                write_mp3_v1(folder / f"{name}.mp3", genre_index, date, track_size)
+            elif layout == 'flac':
+                write_flac(folder / f"{name}.flac", genre, date, track_size)
+            elif layout == 'flac+id3':
+                write_flac_id3(folder / f"{name}.flac", genre, date, track_size)
+            elif layout == 'm4a':
+                write_m4a(folder / f"{name}.m4a", genre, date, track_size)
+            elif layout == 'ogg':
+                write_ogg(folder / f"{name}.ogg", genre, date, track_size)
+            elif layout == 'wav+mp3' and t == tracks - 1:
+                write_mp3(folder / f"{name}.mp3", genre, date, track_size)
+            elif layout in ('wav', 'wav+mp3'):
+                write_wav(folder / f"{name}.wav", track_size)
+            else:
+                (folder / f"{name}.mp3").write_bytes(os.urandom(16).replace(b'\xff', b'\x00') + b'\x00' * track_size)
+
+
+def bytes_read() -> int:
+    """Bytes this process has read through read syscalls (Linux only, else 0)"""
+    try:
+        with open('/proc/self/io') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('rchar'))
+    except (OSError, StopIteration):
+        return 0
+
+
+def run_mode(root: Path, fast_tags: bool):
+    scanner = MusicScanner(str(root), None, fast_tags=fast_tags)
+    folders = sorted({path.parent for path in root.rglob('*') if path.is_file()})
+    results = {}
+    before = bytes_read()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # full parses print per broken file
+        for folder in folders:
+            results[folder] = scanner.get_metadata_from_folder(folder)
+    return results, time.perf_counter() - start, bytes_read() - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--albums', type=int, default=36)
+    parser.add_argument('--tracks', type=int, default=6)
+    parser.add_argument('--track-kb', type=int, default=512)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        print(f"Building synthetic library: {args.albums} albums x {args.tracks} tracks x {args.track_kb} KB...")
+        build_library(root, args.albums, args.tracks, args.track_kb * 1024)
+        
+        # Per-file agreement: the probe must return what a full parse does
+        full_scanner = MusicScanner(tmp_dir, None, fast_tags=False)
+        fast_scanner = MusicScanner(tmp_dir, None, fast_tags=True)
+        files = sorted(path for path in root.rglob('*') if path.suffix.lower() not in NO_TAG_EXTENSIONS)
+        mismatches = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for path in files:
+                full, fast = full_scanner.extract_metadata_from_file(path), fast_scanner.extract_metadata_from_file(path)
+                if full != fast:
+                    mismatches.append((path, full, fast))
+        for path, full, fast in mismatches:
+            print(f"  MISMATCH {path.relative_to(root)}: full={full} fast={fast}")
+        print(f"{len(files)} tagged-format files compared, {len(mismatches)} mismatches\n")
+        
+        print(f"{'mode':>5} {'seconds':>8} {'MB read':>8}")
+        outcomes = {}
+        for _ in range(args.rounds):
+            for fast_tags in (False, True):
+                results, elapsed, read = run_mode(root, fast_tags)
+                label = 'fast' if fast_tags else 'full'
+                outcomes[label] = results
+                print(f"{label:>5} {elapsed:>8.3f} {read / (1024 * 1024):>8.1f}")
+        
+        folder_mismatches = sum(1 for folder in outcomes['full'] if outcomes['full'][folder] != outcomes['fast'][folder])
+        print(f"\n{len(outcomes['full'])} album folders, {folder_mismatches} with different metadata")
+        sys.exit(1 if mismatches or folder_mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Local stand-in for the iTunes search API and artwork CDN, for offline load tests.
+
+Serves /search (same JSON shape as https://itunes.apple.com/search) and the
+artwork URLs it returns, with configurable latency, error rate, 429 rate
+limiting and image size. Point the app at it with ITUNES_BASE_URL:
+
+    python benchmarks/fake_itunes.py --port 8765 --latency 0.05 --rate-limit 0.1
+    ITUNES_BASE_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import io
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from PIL import Image
+
+
+class FakeItunesConfig:
+    """Behaviour of the fake service"""
+    
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: float = 0.0, max_rps: float = 0.0, retry_after: Optional[float] = 1.0,
+                 not_found_rate: float = 0.0, image_kb: int = 100, seed: int = 0):
+        """
+        Args:
+            latency: Mean seconds added to every response
+            jitter: +/- seconds of uniform noise on the latency
+            error_rate: Fraction of requests answered with 500
+            rate_limit: Fraction of requests answered with 429
+            max_rps: Requests/sec above which requests get 429 (0 = unlimited)
+            retry_after: Retry-After seconds sent with 429s (None = omit the header)
+            not_found_rate: Fraction of searches with no results
+            image_kb: Artwork payload size
+            seed: Seed for the outcome/latency random generator
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.not_found_rate = not_found_rate
+        self.image_kb = image_kb
+        self.seed = seed
+
+
+def make_artwork(size: int) -> bytes:
+    """A decodable JPEG padded after its end marker to size bytes"""
+    image = Image.linear_gradient('L').resize((600, 600)).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    data = buffer.getvalue()
+    return data + b'\x00' * max(0, size - len(data))
+
+
+class FakeItunesServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering like iTunes; counts responses by kind in self.counts"""
+    
+    daemon_threads = True
+    
+    def __init__(self, config: FakeItunesConfig, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), FakeItunesHandler)
+        self.config = config
+        self.counts = Counter()
+        self._random = random.Random(config.seed)
+        self._recent = deque()  # request timestamps within the last second
+        self._lock = threading.Lock()
+        self.image = make_artwork(config.image_kb * 1024)
+    
+    def handle_error(self, request, client_address):
+        # Clients that hang up mid-response (e.g. a server under test being stopped) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> threading.Thread:
+        """Serve from a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+    
+    def decide(self, kind: str) -> str:
+        """Pick the outcome of one request: 'ok', 'error', 'rate_limited' or 'not_found'"""
+        config = self.config
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1:
+                self._recent.popleft()
+            
+            roll = self._random.random()
+            if config.max_rps and len(self._recent) >= config.max_rps:
+                # Only admitted requests count towards the limit
+                outcome = 'rate_limited'
+            elif roll < config.rate_limit:
+                outcome = 'rate_limited'
+            elif roll < config.rate_limit + config.error_rate:
+                outcome = 'error'
+            elif kind == 'search' and roll < config.rate_limit + config.error_rate + config.not_found_rate:
+                outcome = 'not_found'
+            else:
+                outcome = 'ok'
+            if outcome != 'rate_limited':
+                self._recent.append(now)
+            self.counts[f"{kind}_{outcome}"] += 1
+            delay = max(0.0, config.latency + self._random.uniform(-config.jitter, config.jitter))
+        
+        time.sleep(delay)
+        return outcome
+
+
+class FakeItunesHandler(BaseHTTPRequestHandler):
+    server: FakeItunesServer
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/search':
+            kind = 'search'
+        elif url.path.startswith('/image/'):
+            kind = 'image'
+        else:
+            self._send(404, b'Not found', 'text/plain')
+            return
+        
+        outcome = self.server.decide(kind)
+        if outcome == 'rate_limited':
+            retry_after = self.server.config.retry_after
+            headers = {'Retry-After': f"{retry_after:g}"} if retry_after is not None else {}
+            self._send(429, b'Too many requests', 'text/plain', headers)
+        elif outcome == 'error':
+            self._send(500, b'Internal error', 'text/plain')
+        elif kind == 'image':
+            self._send(200, self.server.image, 'image/jpeg')
+        else:
+            term = parse_qs(url.query).get('term', [''])[0]
+            results = [] if outcome == 'not_found' else [{
+                'collectionName': term,
+                'artworkUrl100': f"{self.server.base_url}/image/{abs(hash(term)) % 10**8}/100x100bb.jpg",
+            }]
+            body = json.dumps({'resultCount': len(results), 'results': results}).encode()
+            self._send(200, body, 'application/json')
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Command line flags for every FakeItunesConfig field"""
+    parser.add_argument('--latency', type=float, default=0.0, help="mean seconds per response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="+/- seconds of latency noise")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument('--max-rps', type=float, default=0.0, help="429 above this many requests/sec")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds on 429 (<0 omits it)")
+    parser.add_argument('--not-found-rate', type=float, default=0.0, help="fraction of searches without results")
+    parser.add_argument('--image-kb', type=int, default=100, help="artwork size in KB")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def config_from_args(args) -> FakeItunesConfig:
+    return FakeItunesConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, max_rps=args.max_rps,
+        retry_after=args.retry_after if args.retry_after >= 0 else None,
+        not_found_rate=args.not_found_rate, image_kb=args.image_kb, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    server = FakeItunesServer(config_from_args(args), args.host, args.port)
+    print(f"Fake iTunes API on {server.base_url} (set ITUNES_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(dict(server.counts))
+
+
+if __name__ == "__main__":
+    main()
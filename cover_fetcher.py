@@ -1,33 +1,208 @@
+import os
 import requests
+import urllib3
+import tempfile
 from pathlib import Path
-from typing import Optional
-from database import AlbumDatabase
+from typing import Optional, List, Dict, Iterator
+from database import AlbumDatabase, MISSING_COVER
+import heapq
+import itertools
+import json
+import socket
+import threading
 import time
 
+MAX_IMAGE_BYTES = 10 * 1024 * 1024  # 10MB max downloaded cover
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# iTunes API host; override with ITUNES_BASE_URL (e.g. a local fake for load tests)
+ITUNES_BASE_URL = "https://itunes.apple.com"
+
+# Rate-limited (429) and unavailable (503) responses are retried with backoff
+RETRY_STATUSES = {429, 503}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0  # seconds, doubled per attempt unless the server sends Retry-After
+MAX_RETRY_AFTER = 60
+
+# Albums whose background fetch failed (network/HTTP errors) are queued again
+# after this many seconds, doubled per consecutive failure up to the maximum
+FAILED_FETCH_BACKOFF = 60
+MAX_FAILED_FETCH_BACKOFF = 3600
+
+# Albums read per query by fetch_missing_covers and the background backlog; each
+# batch is read in full before fetching, so no read statement (WAL snapshot)
+# stays open across fetches
+FETCH_BATCH_SIZE = 50
+
+# Magic bytes -> file extension for the image types we accept
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'BM', '.bmp'),
+]
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Return the file extension matching an image header, or None if it is not an image"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return '.webp'
+    for signature, ext in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return ext
+    return None
+
+
+def itunes_search_url(base_url: Optional[str] = None) -> str:
+    """iTunes search endpoint under base_url, the ITUNES_BASE_URL env var or the real API"""
+    base_url = base_url or os.environ.get('ITUNES_BASE_URL') or ITUNES_BASE_URL
+    return base_url.rstrip('/') + '/search'
+
+
+def _iter_body(response: requests.Response) -> Iterator[bytes]:
+    """Yield the (decoded) body as it arrives, up to DOWNLOAD_CHUNK_SIZE per read.
+    
+    Unlike iter_content, whose reads block until a whole chunk has arrived,
+    each read1() returns whatever the socket has, so a server trickling bytes
+    cannot hold the caller past its deadline between checks.
+    """
+    try:
+        while True:
+            chunk = response.raw.read1(DOWNLOAD_CHUNK_SIZE, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+    except urllib3.exceptions.HTTPError as e:
+        # Surface read errors as requests exceptions, as iter_content does
+        raise requests.ConnectionError(e) from e
+
+
+def download_image(url: str, dest_stem: Path, max_bytes: int = MAX_IMAGE_BYTES,
+                   timeout: float = 15) -> Path:
+    """Stream an image to disk with a size cap and a total time budget.
+    
+    The body is written in chunks to a temp file next to the destination, its
+    type is sniffed from the magic bytes, and it is atomically renamed to
+    dest_stem plus the matching extension, so memory use stays constant.
+    The time budget is checked after every socket read; a server that stops
+    sending altogether is cut off by the socket timeout.
+    
+    Returns:
+        Path of the saved image
+    
+    Raises:
+        ValueError: if the response is too large, too slow or not an image
+        requests.RequestException: on network/HTTP errors
+    """
+    deadline = time.monotonic() + timeout
+    dest_stem.parent.mkdir(parents=True, exist_ok=True)
+    
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise ValueError(f"Image too large ({content_length} bytes, max {max_bytes})")
+        
+        fd, tmp_name = tempfile.mkstemp(dir=dest_stem.parent, prefix='.download_', suffix='.part')
+        try:
+            size = 0
+            header = b''
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in _iter_body(response):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"Image too large (more than {max_bytes} bytes)")
+                    if time.monotonic() > deadline:
+                        raise ValueError(f"Image download exceeded {timeout}s")
+                    if len(header) < 16:
+                        header += chunk[:16 - len(header)]
+                    f.write(chunk)
+            
+            ext = sniff_image_type(header)
+            if ext is None:
+                raise ValueError("Downloaded file is not a supported image")
+            
+            dest = dest_stem.with_name(dest_stem.name + ext)
+            os.replace(tmp_name, dest)
+            return dest
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+
 class CoverFetcher:
-    def __init__(self, db: AlbumDatabase):
+    def __init__(self, db: AlbumDatabase, base_url: Optional[str] = None, covers_dir: str = "covers"):
+        """
+        Args:
+            db: Database to read albums from and store cover paths in
+            base_url: iTunes API host (default: ITUNES_BASE_URL env var or the real API)
+            covers_dir: Directory downloaded covers are saved to
+        """
         self.db = db
-        self.covers_dir = Path("covers")
+        self.search_url = itunes_search_url(base_url)
+        self.covers_dir = Path(covers_dir)
         self.covers_dir.mkdir(exist_ok=True)
+        self.max_retries = MAX_RETRIES
+        self.retry_backoff = RETRY_BACKOFF
+        self.retry_count = 0  # retried requests since creation
+    
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        """Seconds to wait before retrying: the server's Retry-After, else exponential backoff"""
+        try:
+            return min(float(response.headers['Retry-After']), MAX_RETRY_AFTER)
+        except (KeyError, ValueError):
+            return self.retry_backoff * (2 ** attempt)
+    
+    def _with_retries(self, func, *args, **kwargs):
+        """Call func, retrying it when it fails with a rate-limited/unavailable HTTP response"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                self.retry_count += 1
+                time.sleep(self._retry_delay(e.response, attempt))
+    
+    def _search(self, params: Dict) -> Dict:
+        response = requests.get(self.search_url, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    
+    def _find_artwork(self, artist: str, album: str) -> Optional[str]:
+        """Search iTunes for an album's artwork URL; None if iTunes has no match.
+        Network/HTTP failures raise requests.RequestException."""
+        search_term = f"{artist} {album}"
+        params = {
+            'term': search_term,
+            'media': 'music',
+            'entity': 'album',
+            'limit': 1
+        }
+        data = self._with_retries(self._search, params)
+        if data['resultCount'] > 0:
+            result = data['results'][0]
+            return result.get('artworkUrl100', '').replace('100x100', '600x600') or None
+        return None
+    
+    def _download_artwork(self, url: str, album_id: int, artist: str, album: str) -> str:
+        """Download artwork into covers_dir; raises like download_image()"""
+        # Create filename from artist and album; the extension comes from the image data
+        safe_artist = "".join(c for c in artist if c.isalnum() or c in (' ', '-', '_')).strip()
+        safe_album = "".join(c for c in album if c.isalnum() or c in (' ', '-', '_')).strip()
+        
+        cover_path = self._with_retries(download_image, url,
+                                        self.covers_dir / f"{safe_artist}_{safe_album}_{album_id}")
+        return str(cover_path)
     
     def search_itunes(self, artist: str, album: str) -> Optional[str]:
         """Search iTunes API for album cover"""
         try:
-            search_term = f"{artist} {album}"
-            url = "https://itunes.apple.com/search"
-            params = {
-                'term': search_term,
-                'media': 'music',
-                'entity': 'album',
-                'limit': 1
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if data['resultCount'] > 0:
-                result = data['results'][0]
-                return result.get('artworkUrl100', '').replace('100x100', '600x600')
-            return None
+            return self._find_artwork(artist, album)
         except Exception as e:
             print(f"Error searching iTunes for {artist} - {album}: {e}")
             return None
@@ -35,48 +210,99 @@ class CoverFetcher:
     def download_cover(self, url: str, album_id: int, artist: str, album: str) -> Optional[str]:
         """Download album cover from URL"""
         try:
-            response = requests.get(url, timeout=15)
-            response.raise_for_status()
-            
-            # Create filename from artist and album
-            safe_artist = "".join(c for c in artist if c.isalnum() or c in (' ', '-', '_')).strip()
-            safe_album = "".join(c for c in album if c.isalnum() or c in (' ', '-', '_')).strip()
-            filename = f"{safe_artist}_{safe_album}_{album_id}.jpg"
-            
-            cover_path = self.covers_dir / filename
-            
-            with open(cover_path, 'wb') as f:
-                f.write(response.content)
-            
-            return str(cover_path)
-        
+            return self._download_artwork(url, album_id, artist, album)
         except Exception as e:
             print(f"Error downloading cover for {artist} - {album}: {e}")
             return None
     
-    def fetch_missing_covers(self, limit: Optional[int] = None):
-        """Fetch covers for all albums missing cover art"""
-        albums = self.db.get_albums_without_covers()
+    def store_cover(self, album_id: int, cover_path: str) -> bool:
+        """Save a fetched cover unless the album got one meanwhile (upload, URL,
+        batch update); the unused download is then deleted. Returns whether it was saved."""
+        if self.db.update_cover_path(album_id, cover_path, only_if_missing=True):
+            return True
+        try:
+            os.remove(cover_path)
+        except OSError:
+            pass
+        return False
+    
+    def fetch_cover(self, album_id: int, artist: str, album: str) -> Optional[str]:
+        """Search, download and store the cover for a single album.
         
-        if not albums:
+        Returns:
+            The stored cover path, or None if the album needs no fetch (it has a
+            cover by now, iTunes has no artwork or the artwork is not a usable image)
+        
+        Raises:
+            requests.RequestException: on network/HTTP failures, worth retrying later
+        """
+        if not self.db.count_albums(f"id = ? AND ({MISSING_COVER})", (album_id,)):
+            return None
+        
+        artwork_url = self._find_artwork(artist, album)
+        if not artwork_url:
+            return None
+        
+        try:
+            cover_path = self._download_artwork(artwork_url, album_id, artist, album)
+        except ValueError as e:
+            print(f"Error downloading cover for {artist} - {album}: {e}")
+            return None
+        return cover_path if self.store_cover(album_id, cover_path) else None
+    
+    def _iter_missing_covers(self, count: Optional[int] = None) -> Iterator:
+        """Yield up to count (default: all) albums missing covers in grid order.
+        
+        Albums are read in short keyset batches on (display_order, id) through
+        idx_missing_cover. Albums without a display_order (scanned but not yet
+        shuffled) sort first, as they do in the grid.
+        """
+        last = None
+        unordered = True  # still reading albums without a display_order
+        while count is None or count > 0:
+            if unordered:
+                where, params = "display_order IS NULL AND id > ?", (last.id if last else 0,)
+            elif last is None or last.display_order is None:
+                where, params = "display_order IS NOT NULL", ()
+            else:
+                where, params = "(display_order, id) > (?, ?)", (last.display_order, last.id)
+            size = FETCH_BATCH_SIZE if count is None else min(FETCH_BATCH_SIZE, count)
+            batch = list(self.db.iter_albums(
+                columns=('id', 'display_order', 'artist', 'album'), where=f"{where} AND ({MISSING_COVER})",
+                params=params, order_by="display_order, id", limit=size
+            ))
+            yield from batch
+            if batch:
+                last = batch[-1]
+            if count is not None:
+                count -= len(batch)
+            if len(batch) < size:
+                if not unordered:
+                    return
+                unordered = False
+    
+    def fetch_missing_covers(self, limit: Optional[int] = None, delay: float = 0.5):
+        """Fetch covers for all albums missing cover art, waiting delay seconds between albums"""
+        total = self.db.count_albums(MISSING_COVER)
+        
+        if not total:
             print("No albums missing covers!")
             return
         
-        total = len(albums)
-        if limit:
-            albums = albums[:limit]
+        count = min(total, limit) if limit else total
+        albums = self._iter_missing_covers(count)
         
-        print(f"Found {total} albums without covers. Fetching covers for {len(albums)} albums...")
+        print(f"Found {total} albums without covers. Fetching covers for {count} albums...")
         
         success_count = 0
         failed_count = 0
         
         for i, album in enumerate(albums, 1):
-            artist = album['artist']
-            album_name = album['album']
-            album_id = album['id']
+            artist = album.artist
+            album_name = album.album
+            album_id = album.id
             
-            print(f"[{i}/{len(albums)}] Fetching cover for: {artist} - {album_name}")
+            print(f"[{i}/{count}] Fetching cover for: {artist} - {album_name}")
             
             # Search for cover via iTunes
             artwork_url = self.search_itunes(artist, album_name)
@@ -85,25 +311,223 @@ class CoverFetcher:
                 # Download cover
                 cover_path = self.download_cover(artwork_url, album_id, artist, album_name)
                 
-                if cover_path:
-                    # Update database
-                    self.db.update_cover_path(album_id, cover_path)
+                if not cover_path:
+                    failed_count += 1
+                    print(f"  ✗ Failed to download")
+                elif self.store_cover(album_id, cover_path):
                     success_count += 1
                     print(f"  ✓ Downloaded cover")
                 else:
-                    failed_count += 1
-                    print(f"  ✗ Failed to download")
+                    print(f"  - Cover was set meanwhile, kept it")
             else:
                 failed_count += 1
                 print(f"  ✗ Cover not found")
             
             # Rate limiting - be nice to the API
-            time.sleep(0.5)
+            time.sleep(delay)
         
         print(f"\nCover fetch complete!")
         print(f"Success: {success_count}")
         print(f"Failed: {failed_count}")
 
+class CoverFetchScheduler:
+    """Long-lived background worker that fetches missing covers by priority.
+    
+    The backlog drains in display_order, a batch at a time, so the first grid
+    pages get artwork first. Albums served in an /api/albums page are bumped ahead of the backlog
+    so whatever users are looking at is fetched within seconds.
+    """
+    
+    VISIBLE = 0
+    BACKLOG = 1
+    
+    def __init__(self, fetcher: CoverFetcher, delay: float = 0.5, refill_interval: int = 300):
+        """
+        Args:
+            fetcher: CoverFetcher used to search, download and store covers
+            delay: Delay in seconds between iTunes requests (rate limiting)
+            refill_interval: Seconds to wait after a full pass over the backlog before starting another
+        """
+        self.fetcher = fetcher
+        self.delay = delay
+        self.refill_interval = refill_interval
+        self._heap = []
+        self._queued = {}  # album_id -> best queued priority
+        self._attempted = set()  # album ids handled for good (cover stored, or none to fetch)
+        self._failures = {}  # album_id -> (consecutive failures, time.monotonic() it may be queued again)
+        self._current = None  # album id being fetched
+        self._backlog = None  # iterator over the albums missing covers, read a batch at a time
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+    
+    def start(self):
+        """Start the background worker thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Ask the worker to exit after the current album"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+    
+    def bump(self, albums: List[Dict]):
+        """Move albums that are on screen to the front of the queue"""
+        with self._cond:
+            for album in albums:
+                if not album.get('cover_path'):
+                    self._push(self.VISIBLE, album['id'], album.get('display_order'), album['artist'], album['album'])
+            self._cond.notify()
+    
+    def pending(self) -> int:
+        """Number of albums waiting to be fetched"""
+        with self._cond:
+            return len(self._queued)
+    
+    def _push(self, priority: int, album_id: int, display_order: Optional[int], artist: str, album: str):
+        """Queue an album unless it is already queued at the same or higher priority.
+        Must be called with the condition held."""
+        if album_id in self._attempted or album_id == self._current:
+            return
+        if album_id in self._failures and time.monotonic() < self._failures[album_id][1]:
+            return
+        if self._queued.get(album_id, priority + 1) <= priority:
+            return
+        self._queued[album_id] = priority
+        heapq.heappush(self._heap, (
+            priority,
+            # Unshuffled albums (NULL display_order) come first, as in the grid
+            display_order if display_order is not None else -1,
+            album_id,
+            artist,
+            album
+        ))
+    
+    def _pop(self):
+        """Pop the next live queue entry, skipping superseded ones.
+        Must be called with the condition held."""
+        while self._heap:
+            priority, _, album_id, artist, album = heapq.heappop(self._heap)
+            if self._queued.get(album_id) == priority:
+                del self._queued[album_id]
+                self._current = album_id
+                return album_id, artist, album
+        return None
+    
+    def _refill(self) -> bool:
+        """Queue the next FETCH_BATCH_SIZE albums of the backlog (in grid order).
+        Only one batch is held in memory; returns False once the backlog has
+        been read to the end, and the next call starts over from the top."""
+        try:
+            if self._backlog is None:
+                self._backlog = self.fetcher._iter_missing_covers()
+            albums = list(itertools.islice(self._backlog, FETCH_BATCH_SIZE))
+        except Exception as e:
+            print(f"Error loading albums without covers: {e}")
+            albums = []
+        
+        if not albums:
+            self._backlog = None
+            return False
+        with self._cond:
+            for album in albums:
+                self._push(self.BACKLOG, *album)
+        return True
+    
+    def _run(self):
+        backlog_done = None  # time.time() the last pass over the backlog ended
+        
+        while True:
+            with self._cond:
+                if backlog_done is not None and not self._heap and not self._stopped:
+                    self._cond.wait(timeout=max(0, self.refill_interval - (time.time() - backlog_done)))
+                if self._stopped:
+                    return
+                entry = self._pop()
+            
+            if entry is None:
+                if backlog_done is None or time.time() - backlog_done >= self.refill_interval:
+                    backlog_done = None if self._refill() else time.time()
+                continue
+            
+            album_id, artist, album = entry
+            failed = False
+            try:
+                if self.fetcher.fetch_cover(album_id, artist, album):
+                    print(f"✓ Fetched cover for: {artist} - {album}")
+            except Exception as e:
+                failed = True
+                print(f"Error fetching cover for {artist} - {album}: {e}")
+            
+            with self._cond:
+                self._current = None
+                if failed:
+                    # Transient failure: let bump()/_refill() queue it again after a backoff
+                    failures = self._failures.get(album_id, (0, 0))[0] + 1
+                    backoff = min(FAILED_FETCH_BACKOFF * 2 ** (failures - 1), MAX_FAILED_FETCH_BACKOFF)
+                    self._failures[album_id] = (failures, time.monotonic() + backoff)
+                else:
+                    self._failures.pop(album_id, None)
+                    self._attempted.add(album_id)
+            
+            # Rate limiting - be nice to the API
+            time.sleep(self.delay)
+
+
+class CoverBumpRelay:
+    """Stand-in for the scheduler in the other processes of a prefork server.
+    
+    bump() forwards the albums to the process running the CoverFetchScheduler
+    (see serve_cover_bumps) as one Unix datagram. Delivery is best effort: a
+    bump that cannot be sent is dropped, the backlog still covers the album.
+    """
+    
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+    
+    def bump(self, albums: List[Dict]):
+        missing = [[a['id'], a.get('display_order'), a['artist'], a['album']]
+                   for a in albums if not a.get('cover_path')]
+        if not missing:
+            return
+        try:
+            self._sock.sendto(json.dumps(missing).encode(), self.socket_path)
+        except OSError:
+            pass
+
+
+def serve_cover_bumps(scheduler: CoverFetchScheduler, socket_path: str) -> threading.Thread:
+    """Apply bumps sent by CoverBumpRelay instances to scheduler, from a daemon thread"""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(socket_path)
+    
+    def receive():
+        while True:
+            try:
+                rows = json.loads(sock.recv(1 << 20))
+                scheduler.bump([{'id': row[0], 'display_order': row[1], 'artist': row[2], 'album': row[3]}
+                                for row in rows])
+            except (ValueError, TypeError, IndexError) as e:
+                print(f"Ignoring malformed cover bump: {e}")
+    
+    thread = threading.Thread(target=receive, daemon=True)
+    thread.start()
+    return thread
+
+
+def start_cover_scheduler(db: AlbumDatabase, delay: float = 0.5) -> CoverFetchScheduler:
+    """Start fetching missing covers in the background, in display order"""
+    scheduler = CoverFetchScheduler(CoverFetcher(db), delay=delay)
+    scheduler.start()
+    print("✓ Started background cover fetching")
+    return scheduler
+
 if __name__ == "__main__":
     import sys
     
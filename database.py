@@ -1,7 +1,172 @@
+import os
 import sqlite3
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple, Iterator, Sequence
+from collections import namedtuple
+from functools import lru_cache
 from datetime import datetime
+from placeholders import compute_placeholder
+
+ALBUM_COLUMNS = (
+    'id', 'genre', 'artist', 'album', 'release_date', 'cover_path', 'shared', 'display_order',
+    'folder_path', 'created_at', 'updated_at', 'dominant_color', 'blurhash'
+)
+
+
+# Condition selecting albums that still need cover art
+MISSING_COVER = "cover_path IS NULL OR cover_path = ''"
+
+# Condition selecting albums with a cover whose placeholder has not been computed
+MISSING_PLACEHOLDER = "cover_path IS NOT NULL AND cover_path != '' AND blurhash IS NULL"
+
+# Albums read per query by the placeholder backfill
+PLACEHOLDER_BATCH_SIZE = 200
+
+# Release decade (e.g. 1990) parsed from release_date ('1997', '1997-05-12', ...), NULL if unknown.
+# Queries must use this exact expression to hit idx_facet_decade.
+DECADE_EXPR = (
+    "(CASE WHEN substr(release_date, 1, 4) GLOB '[0-9][0-9][0-9][0-9]' "
+    "THEN CAST(substr(release_date, 1, 3) AS INTEGER) * 10 END)"
+)
+
+FACETS = {
+    'genre': 'genre',
+    'artist': 'artist',
+    'decade': DECADE_EXPR,
+}
+
+
+def _migration_1_base_schema(cursor: sqlite3.Cursor):
+    """Schema as it stood before versioning; idempotent, since unversioned
+    databases may be at any earlier stage of it"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS albums (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            genre TEXT,
+            artist TEXT NOT NULL,
+            album TEXT NOT NULL,
+            release_date TEXT,
+            cover_path TEXT,
+            shared BOOLEAN DEFAULT 0,
+            display_order INTEGER,
+            folder_path TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            dominant_color TEXT,
+            blurhash TEXT
+        )
+    """)
+    
+    # Add placeholder columns to databases created before they existed
+    existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(albums)")}
+    for column in ('dominant_color', 'blurhash'):
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE albums ADD COLUMN {column} TEXT")
+    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_artist ON albums(artist)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_display_order ON albums(display_order)")
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scan_checkpoints (
+            root TEXT PRIMARY KEY,
+            last_folder TEXT NOT NULL,
+            added INTEGER DEFAULT 0,
+            skipped INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _migration_2_covering_indexes(cursor: sqlite3.Cursor):
+    """Indexes matching the real access paths instead of single columns"""
+    # /api/albums: shared filter + display_order, read in index order (no sort)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shared_display_order ON albums(shared, display_order)")
+    
+    # Cover fetching: only albums still missing a cover, covering what the fetchers read
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_missing_cover
+        ON albums(display_order, artist, album, cover_path) WHERE {MISSING_COVER}
+    """)
+    
+    # /api/stats: covering index so the aggregate never touches the table;
+    # its artist prefix replaces idx_artist
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_artist_stats ON albums(artist, shared, cover_path)")
+    cursor.execute("DROP INDEX IF EXISTS idx_artist")
+
+
+def _migration_3_facet_indexes(cursor: sqlite3.Cursor):
+    """Indexes for the genre/artist/decade facets: (shared, value) covers the
+    GROUP BY counts, and the trailing display_order serves filtered pages in
+    grid order without a sort. release_date makes the decade index covering."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_facet_genre ON albums(shared, genre, display_order)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_facet_artist ON albums(shared, artist, display_order)")
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_facet_decade
+        ON albums(shared, {DECADE_EXPR}, display_order, release_date)
+    """)
+
+
+def _migration_4_missing_cover_keyset(cursor: sqlite3.Cursor):
+    """Rebuild idx_missing_cover with id after display_order, so the cover
+    backlog is paged by (display_order, id) keyset straight off the index"""
+    cursor.execute("DROP INDEX IF EXISTS idx_missing_cover")
+    cursor.execute(f"""
+        CREATE INDEX idx_missing_cover
+        ON albums(display_order, id, artist, album, cover_path) WHERE {MISSING_COVER}
+    """)
+
+
+# Schema migrations in order; a database at user_version N has run MIGRATIONS[:N]
+MIGRATIONS = [
+    _migration_1_base_schema,
+    _migration_2_covering_indexes,
+    _migration_3_facet_indexes,
+    _migration_4_missing_cover_keyset,
+]
+
+
+def build_album_filter(shared: Optional[bool] = None, genre: Optional[str] = None,
+                       artist: Optional[str] = None, decade: Optional[int] = None) -> Tuple[str, Tuple]:
+    """Build an iter_albums()/count_albums() condition for the facet filters.
+    Every term matches a facet index, so filtering happens in SQL."""
+    terms, params = [], []
+    if shared is not None:
+        terms.append("shared = ?")
+        params.append(1 if shared else 0)
+    if genre:
+        terms.append("genre = ?")
+        params.append(genre)
+    if artist:
+        terms.append("artist = ?")
+        params.append(artist)
+    if decade is not None:
+        terms.append(f"{DECADE_EXPR} = ?")
+        params.append(decade)
+    return " AND ".join(terms), tuple(params)
+
+
+def _path_name(folder_path: str) -> str:
+    """Album name the scanner gives an album folder (SQL function for move_folder)"""
+    return Path(folder_path).name
+
+
+def _path_parent_name(folder_path: str) -> str:
+    """Artist name the scanner gives an album folder (SQL function for move_folder)"""
+    path = Path(folder_path)
+    return path.parent.name if path.parent != path else "Unknown Artist"
+
+
+def _register_path_functions(conn: sqlite3.Connection):
+    """Make path_name() and path_parent_name() available to SQL on conn"""
+    conn.create_function('path_name', 1, _path_name, deterministic=True)
+    conn.create_function('path_parent_name', 1, _path_parent_name, deterministic=True)
+
+
+@lru_cache(maxsize=None)
+def album_row_type(columns: Tuple[str, ...]):
+    """Compact namedtuple row class for a column selection (cached per selection)"""
+    return namedtuple('AlbumRow', columns)
+
 
 class AlbumDatabase:
     def __init__(self, db_path: str = "albums.db"):
@@ -9,48 +174,47 @@ class AlbumDatabase:
         self.init_database()
     
     def init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Initialize the database and bring its schema up to date"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
         
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS albums (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                genre TEXT,
-                artist TEXT NOT NULL,
-                album TEXT NOT NULL,
-                release_date TEXT,
-                cover_path TEXT,
-                shared BOOLEAN DEFAULT 0,
-                display_order INTEGER,
-                folder_path TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_artist ON albums(artist)
-        """)
+        # WAL lets streaming readers (iter_albums) and writers run concurrently
+        conn.execute("PRAGMA journal_mode=WAL")
         
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_display_order ON albums(display_order)
-        """)
+        try:
+            self.migrate(conn)
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def migrate(conn: sqlite3.Connection):
+        """Apply pending MIGRATIONS, tracking the schema version in PRAGMA user_version.
+        Each migration runs in its own transaction together with its version bump."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
         
-        conn.commit()
-        conn.close()
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {target}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
     
     def add_album(self, genre: str, artist: str, album: str, folder_path: str,
-                  release_date: Optional[str] = None, cover_path: Optional[str] = None) -> int:
+                  release_date: Optional[str] = None, cover_path: Optional[str] = None,
+                  dominant_color: Optional[str] = None, blurhash: Optional[str] = None) -> int:
         """Add a new album to the database"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
             cursor.execute("""
-                INSERT INTO albums (genre, artist, album, release_date, cover_path, folder_path)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (genre, artist, album, release_date, cover_path, folder_path))
+                INSERT INTO albums (genre, artist, album, release_date, cover_path, folder_path,
+                                    dominant_color, blurhash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (genre, artist, album, release_date, cover_path, folder_path, dominant_color, blurhash))
             
             album_id = cursor.lastrowid
             conn.commit()
@@ -61,19 +225,148 @@ class AlbumDatabase:
         finally:
             conn.close()
     
-    def update_cover_path(self, album_id: int, cover_path: str):
-        """Update the cover path for an album"""
+    def add_albums(self, albums: List[Dict]) -> List[int]:
+        """Add several albums in a single transaction.
+        Each dict holds add_album() arguments; returns the new ids, -1 for existing albums."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        album_ids = []
+        try:
+            for album in albums:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO albums (genre, artist, album, release_date, cover_path, folder_path,
+                                                  dominant_color, blurhash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (album.get('genre'), album['artist'], album['album'], album.get('release_date'),
+                      album.get('cover_path'), album['folder_path'],
+                      album.get('dominant_color'), album.get('blurhash')))
+                album_ids.append(cursor.lastrowid if cursor.rowcount == 1 else -1)
+            conn.commit()
+            return album_ids
+        finally:
+            conn.close()
+    
+    def save_scan_checkpoint(self, root: str, last_folder: str, added: int, skipped: int):
+        """Record the last folder committed by a scan of root, for resuming"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
-            UPDATE albums SET cover_path = ?, updated_at = CURRENT_TIMESTAMP
+            INSERT OR REPLACE INTO scan_checkpoints (root, last_folder, added, skipped, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (root, last_folder, added, skipped))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_scan_checkpoint(self, root: str) -> Optional[Dict]:
+        """Get the checkpoint of an unfinished scan of root, if any"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM scan_checkpoints WHERE root = ?", (root,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+    
+    def get_scan_checkpoints(self) -> List[Dict]:
+        """Get the checkpoints of all unfinished scans"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM scan_checkpoints ORDER BY root")
+        checkpoints = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return checkpoints
+    
+    def clear_scan_checkpoint(self, root: str):
+        """Forget the checkpoint of root once its scan has finished"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("DELETE FROM scan_checkpoints WHERE root = ?", (root,))
+        
+        conn.commit()
+        conn.close()
+    
+    def update_cover_path(self, album_id: int, cover_path: str, only_if_missing: bool = False) -> bool:
+        """Update the cover path (and its placeholder color/blurhash) for an album.
+        With only_if_missing=True an album that already has a cover is left alone,
+        so background fetches never overwrite a cover set in the meantime.
+        Returns whether the album was updated."""
+        dominant_color, blurhash = compute_placeholder(cover_path)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(f"""
+            UPDATE albums SET cover_path = ?, dominant_color = ?, blurhash = ?,
+                              updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?{f' AND ({MISSING_COVER})' if only_if_missing else ''}
+        """, (cover_path, dominant_color, blurhash, album_id))
+        updated = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        return updated
+    
+    def update_placeholder(self, album_id: int, dominant_color: Optional[str], blurhash: Optional[str]):
+        """Store the placeholder color/blurhash computed for an album's cover"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE albums SET dominant_color = ?, blurhash = ?
             WHERE id = ?
-        """, (cover_path, album_id))
+        """, (dominant_color, blurhash, album_id))
         
         conn.commit()
         conn.close()
     
+    def iter_albums_missing_placeholders(self, limit: Optional[int] = None,
+                                         batch_size: int = PLACEHOLDER_BATCH_SIZE) -> Iterator[tuple]:
+        """Yield (id, cover_path) rows of albums that have a cover but no placeholder yet.
+        Rows come in id order, read in short keyset batches, so no read stays
+        open while the caller decodes covers."""
+        last_id = 0
+        while limit is None or limit > 0:
+            size = batch_size if limit is None else min(batch_size, limit)
+            batch = list(self.iter_albums(
+                columns=('id', 'cover_path'), where=f"id > ? AND {MISSING_PLACEHOLDER}",
+                params=(last_id,), order_by="id", limit=size
+            ))
+            yield from batch
+            if len(batch) < size:
+                return
+            last_id = batch[-1].id
+            if limit is not None:
+                limit -= len(batch)
+    
+    def backfill_placeholders(self, limit: Optional[int] = None):
+        """Compute placeholders for existing albums whose cover predates them"""
+        total = self.count_albums(MISSING_PLACEHOLDER)
+        if limit:
+            total = min(total, limit)
+        
+        print(f"Computing placeholders for {total} albums...")
+        
+        updated = 0
+        processed = 0
+        for processed, album in enumerate(self.iter_albums_missing_placeholders(limit=limit or None), 1):
+            dominant_color, blurhash = compute_placeholder(album.cover_path)
+            if blurhash:
+                self.update_placeholder(album.id, dominant_color, blurhash)
+                updated += 1
+            if processed % 200 == 0:
+                print(f"  Progress: {processed}/{total} albums...")
+        
+        print(f"Placeholder backfill complete! Updated: {updated}, Failed: {processed - updated}")
+    
     def toggle_shared(self, album_id: int):
         """Toggle the shared status of an album"""
         conn = sqlite3.connect(self.db_path)
@@ -87,35 +380,244 @@ class AlbumDatabase:
         conn.commit()
         conn.close()
     
-    def get_all_albums(self, order_by: str = "display_order") -> List[Dict]:
-        """Get all albums ordered by specified field"""
+    def set_shared(self, album_ids: Sequence[int], shared: bool) -> Dict[int, bool]:
+        """Set (not toggle) the shared status of several albums in one transaction.
+        Idempotent, so safe to retry. Returns album id -> whether the album exists."""
         conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute(f"""
-            SELECT * FROM albums ORDER BY {order_by}
-        """)
+        results = {}
+        try:
+            for album_id in album_ids:
+                cursor.execute("""
+                    UPDATE albums SET shared = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (1 if shared else 0, album_id))
+                results[album_id] = cursor.rowcount > 0
+            conn.commit()
+            return results
+        finally:
+            conn.close()
+    
+    def set_shared_where(self, shared: bool, where: str, params: Sequence = ()) -> List[int]:
+        """Set the shared status of every album matching a condition in one transaction.
+        Returns the ids of the matched albums."""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        cursor = conn.cursor()
         
-        albums = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        try:
+            # Take the write lock first so the matched ids are exactly the updated rows
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(f"SELECT id FROM albums WHERE {where}", tuple(params))
+            album_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"""
+                UPDATE albums SET shared = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE {where}
+            """, (1 if shared else 0,) + tuple(params))
+            cursor.execute("COMMIT")
+            return album_ids
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def update_cover_paths(self, covers: Sequence[Tuple[int, str]]) -> Dict[int, bool]:
+        """Update cover paths (and placeholders) of several albums in one transaction.
+        Returns album id -> whether the album exists."""
+        # Decode images before opening the transaction to keep the write lock short
+        rows = [(cover_path, *compute_placeholder(cover_path), album_id) for album_id, cover_path in covers]
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
         
-        return albums
+        results = {}
+        try:
+            for row in rows:
+                cursor.execute("""
+                    UPDATE albums SET cover_path = ?, dominant_color = ?, blurhash = ?,
+                                      updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, row)
+                results[row[-1]] = cursor.rowcount > 0
+            conn.commit()
+            return results
+        finally:
+            conn.close()
     
-    def get_albums_without_covers(self) -> List[Dict]:
-        """Get all albums that don't have cover art"""
+    def get_folder_paths(self, album_ids: Sequence[int]) -> Dict[int, str]:
+        """Album id -> folder_path for those of album_ids that exist"""
+        album_ids = list(album_ids)
+        folder_paths = {}
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(album_ids), 500):
+            chunk = album_ids[start:start + 500]
+            folder_paths.update(self.iter_albums(
+                columns=('id', 'folder_path'), where=f"id IN ({', '.join('?' * len(chunk))})", params=chunk
+            ))
+        return folder_paths
+    
+    @staticmethod
+    def _descendant_bounds(folder_path: str) -> Tuple[str, str]:
+        """Return the [low, high) key range covering every path below folder_path"""
+        prefix = folder_path.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+    
+    def move_folder(self, old_path: str, new_path: str) -> int:
+        """Rewrite folder_path (and in-folder cover_path) for a moved directory.
+        Matches the folder itself and every album below it through the
+        folder_path index, so shared/cover/order state is kept in place.
+        album and artist are re-derived from the new path the way the scanner
+        names them, so renaming an album or artist folder renames it in the grid."""
+        low, high = self._descendant_bounds(old_path)
+        old_base = old_path.rstrip(os.sep)
+        new_base = new_path.rstrip(os.sep)
+        
+        conn = sqlite3.connect(self.db_path)
+        _register_path_functions(conn)
+        cursor = conn.cursor()
+        
+        new_folder_path = ":new_base || substr(folder_path, :suffix_start)"
+        try:
+            cursor.execute(f"""
+                UPDATE albums SET
+                    folder_path = {new_folder_path},
+                    album = path_name({new_folder_path}),
+                    artist = path_parent_name({new_folder_path}),
+                    cover_path = CASE
+                        WHEN substr(cover_path, 1, :low_len) = :low THEN :new_base || substr(cover_path, :suffix_start)
+                        ELSE cover_path
+                    END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE folder_path = :old_base OR (folder_path >= :low AND folder_path < :high)
+            """, {'new_base': new_base, 'suffix_start': len(old_base) + 1, 'low': low, 'low_len': len(low),
+                  'high': high, 'old_base': old_base})
+            moved = cursor.rowcount
+            conn.commit()
+            return moved
+        except sqlite3.IntegrityError:
+            # Destination already indexed (e.g. scanned before the move event arrived)
+            conn.rollback()
+            return -1
+        finally:
+            conn.close()
+    
+    def delete_folder(self, folder_path: str) -> int:
+        """Remove albums stored at folder_path or anywhere below it"""
+        low, high = self._descendant_bounds(folder_path)
+        
         conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT * FROM albums WHERE cover_path IS NULL OR cover_path = ''
-        """)
+            DELETE FROM albums
+            WHERE folder_path = ? OR (folder_path >= ? AND folder_path < ?)
+        """, (folder_path.rstrip(os.sep), low, high))
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def iter_albums(self, columns: Optional[Sequence[str]] = None, where: str = "",
+                    params: Sequence = (), order_by: Optional[str] = None,
+                    limit: Optional[int] = None, offset: int = 0,
+                    batch_size: int = 500) -> Iterator[tuple]:
+        """Stream album rows without materializing the whole table.
+        
+        Args:
+            columns: Columns to select (default: all); rows are namedtuples with these fields
+            where: Optional SQL condition, with ? placeholders bound from params
+            params: Values for the placeholders in where
+            order_by: Optional ORDER BY expression
+            limit: Optional maximum number of rows (with offset, for pagination in SQL)
+            offset: Rows to skip when limit is given
+            batch_size: Rows fetched from sqlite per fetchmany() call
+        """
+        columns = tuple(columns) if columns else ALBUM_COLUMNS
+        unknown = set(columns) - set(ALBUM_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown album columns: {', '.join(sorted(unknown))}")
+        row_type = album_row_type(columns)
+        
+        query = f"SELECT {', '.join(columns)} FROM albums"
+        if where:
+            query += f" WHERE {where}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        params = tuple(params)
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params += (limit, offset)
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row_type._make(row)
+        finally:
+            conn.close()
+    
+    def count_albums(self, where: str = "", params: Sequence = ()) -> int:
+        """Count albums matching an optional SQL condition"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(f"SELECT COUNT(*) FROM albums{' WHERE ' + where if where else ''}", tuple(params))
+        count = cursor.fetchone()[0]
         
-        albums = [dict(row) for row in cursor.fetchall()]
         conn.close()
+        return count
+    
+    def get_facets(self, shared: Optional[bool] = None, limit: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """Album counts per genre, artist and release decade.
+        
+        Each facet is one GROUP BY over its (shared, value) covering index;
+        grouping by shared too keeps the index order, so no temp sort is needed
+        even when counting shared and unshared albums together.
+        
+        Args:
+            shared: Only count shared (True) or unshared (False) albums; None counts all
+            limit: Keep only the largest buckets of each facet
+        
+        Returns:
+            {facet: [{'value': ..., 'count': ...}, ...]} sorted by count, largest first
+        """
+        where, params = build_album_filter(shared=shared)
         
-        return albums
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        facets = {}
+        for facet, expr in FACETS.items():
+            cursor.execute(f"""
+                SELECT {expr}, COUNT(*) FROM albums
+                {'WHERE ' + where if where else ''}
+                GROUP BY shared, {expr}
+            """, params)
+            counts = {}
+            for value, count in cursor.fetchall():
+                counts[value] = counts.get(value, 0) + count
+            buckets = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+            facets[facet] = [{'value': value, 'count': count} for value, count in buckets[:limit]]
+        
+        conn.close()
+        return facets
+    
+    def get_all_albums(self, order_by: str = "display_order") -> List[Dict]:
+        """Get all albums ordered by specified field.
+        Materializes every row; prefer iter_albums() for large libraries."""
+        return [row._asdict() for row in self.iter_albums(order_by=order_by)]
+    
+    def get_albums_without_covers(self) -> List[Dict]:
+        """Get all albums that don't have cover art.
+        Materializes every row; prefer iter_albums() for large libraries."""
+        return [row._asdict() for row in self.iter_albums(where=MISSING_COVER)]
     
     def shuffle_display_order(self):
         """Shuffle albums so that same artists are not adjacent"""
@@ -178,6 +680,18 @@ class AlbumDatabase:
         
         print(f"Shuffled {len(shuffled)} albums")
     
+    def explain(self, sql: str, params: Sequence = ()) -> List[str]:
+        """EXPLAIN QUERY PLAN details for a query"""
+        conn = sqlite3.connect(self.db_path)
+        _register_path_functions(conn)
+        cursor = conn.cursor()
+        
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", tuple(params))
+        plan = [row[3] for row in cursor.fetchall()]
+        
+        conn.close()
+        return plan
+    
     def get_album_count(self) -> int:
         """Get total number of albums in database"""
         conn = sqlite3.connect(self.db_path)
@@ -226,6 +226,8 @@ function App() {
                 src={album.cover_path ? `/cover/${encodeURIComponent(album.cover_path)}` : '/static/placeholder.svg'} 
                 alt={album.album} 
                 className="album-cover" 
+                loading="lazy"
+                style={album.dominant_color ? { background: album.dominant_color } : undefined}
                 onError={(e) => { 
                   if (!e.target.src.includes('placeholder.svg')) {
                     e.target.src = '/static/placeholder.svg';
@@ -1,53 +1,189 @@
+import hashlib
 import os
+import tempfile
+import threading
 from pathlib import Path
 from database import AlbumDatabase
-from scanner import MusicScanner
+from typing import Callable, List, Optional
+from scanner import scan_roots, parse_music_roots
 from watcher import start_watcher
+from cover_fetcher import start_cover_scheduler, serve_cover_bumps, CoverBumpRelay
 
 
-def run_scan(music_root: str, db_path: str) -> None:
+def run_scan(music_roots: List[str], db_path: str) -> None:
     db = AlbumDatabase(db_path)
-    scanner = MusicScanner(music_root, db)
-    scanner.scan()
+    scan_roots(music_roots, db)
 
 
-def run_server(db_path: str, host: str, port: int, debug: bool, music_root: str, enable_watcher: bool = True) -> None:
+def serve_wsgi(app, server: str, host: str, port: int, debug: bool, threads: int = 8, workers: int = 4,
+               post_worker_init: Optional[Callable] = None) -> None:
+    """Run the WSGI app with the selected server.
+    
+    Args:
+        server: 'dev' (Flask development server), 'threaded' (waitress, one
+            process with a thread pool) or 'prefork' (gunicorn, POSIX only,
+            worker processes each with their own threads)
+        threads: Request threads (per worker for prefork)
+        workers: Worker processes for prefork
+        post_worker_init: gunicorn hook called in each prefork worker after it starts
+    
+    Both production servers stream send_file() responses (covers, assets)
+    through wsgi.file_wrapper; gunicorn uses sendfile(2) for them.
+    """
+    if server == 'threaded':
+        from waitress import serve
+        print(f"✓ Serving with waitress on {host}:{port} ({threads} threads)")
+        serve(app, host=host, port=port, threads=threads)
+    elif server == 'prefork':
+        from gunicorn.app.base import BaseApplication
+        
+        class GunicornApp(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f"{host}:{port}")
+                self.cfg.set('workers', workers)
+                self.cfg.set('threads', threads)
+                self.cfg.set('worker_class', 'gthread')
+                self.cfg.set('sendfile', True)
+                if post_worker_init:
+                    self.cfg.set('post_worker_init', post_worker_init)
+            
+            def load(self):
+                return app
+        
+        print(f"✓ Serving with gunicorn on {host}:{port} ({workers} workers x {threads} threads)")
+        GunicornApp().run()
+    elif server == 'dev':
+        # Disable auto-reloader to avoid duplicate logs and infinite startup loops
+        app.run(debug=debug, host=host, port=port, use_reloader=False)
+    else:
+        raise ValueError(f"Unknown SERVER '{server}', expected dev, threaded or prefork")
+
+
+def start_background_workers(db_path: str, music_roots: List[str], enable_watcher: bool = True,
+                             enable_cover_fetch: bool = True, bump_socket: Optional[str] = None) -> Callable[[], None]:
+    """Start the startup scan resume, file watchers and cover scheduler in this process.
+    With bump_socket, cover bumps relayed from other processes are accepted there.
+    
+    Returns:
+        Function that stops the watchers and the scheduler
+    """
+    from app import set_cover_scheduler
+    
+    # Resume a scan interrupted by a crash/restart (e.g. a long first import)
+    interrupted = [c['root'] for c in AlbumDatabase(db_path).get_scan_checkpoints() if c['root'] in music_roots]
+    if interrupted:
+        print(f"✓ Resuming interrupted scan of: {', '.join(interrupted)}")
+        threading.Thread(target=scan_roots, args=(interrupted, AlbumDatabase(db_path)),
+                         kwargs={'resume': True}, daemon=True).start()
+    
+    # Start one file watcher per root if enabled; while a root is being scanned
+    # (including the resume above) its watcher defers auto-scans until it is done
+    watchers = []
+    if enable_watcher:
+        db = AlbumDatabase(db_path)
+        for music_root in music_roots:
+            watcher = start_watcher(music_root, db, scan_delay=5)
+            if watcher:
+                watchers.append(watcher)
+    
+    # Fetch missing covers in the background, visible albums first
+    cover_scheduler = None
+    if enable_cover_fetch:
+        cover_scheduler = start_cover_scheduler(AlbumDatabase(db_path))
+        set_cover_scheduler(cover_scheduler)
+        if bump_socket:
+            serve_cover_bumps(cover_scheduler, bump_socket)
+    
+    def stop():
+        if cover_scheduler:
+            cover_scheduler.stop()
+        for watcher in watchers:
+            watcher.stop()
+        for watcher in watchers:
+            watcher.join()
+    
+    return stop
+
+
+def prefork_background_hook(db_path: str, music_roots: List[str], enable_watcher: bool,
+                            enable_cover_fetch: bool) -> Callable:
+    """gunicorn post_worker_init hook running the background workers in exactly one worker.
+    
+    The first worker to take an exclusive file lock starts them and keeps the
+    lock until it exits; a replacement worker then takes over. The other
+    workers get a CoverBumpRelay, so albums they serve are still fetched first.
+    """
+    key = hashlib.sha1(os.path.abspath(db_path).encode()).hexdigest()[:12]
+    lock_path = os.path.join(tempfile.gettempdir(), f"album-browser-{key}.lock")
+    bump_socket = os.path.join(tempfile.gettempdir(), f"album-browser-{key}.sock")
+    
+    def post_worker_init(worker):
+        import fcntl
+        from app import set_cover_scheduler
+        
+        lock_file = open(lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            if enable_cover_fetch:
+                set_cover_scheduler(CoverBumpRelay(bump_socket))
+            return
+        
+        worker.background_lock = lock_file  # released when the worker exits
+        print(f"✓ Worker {os.getpid()} runs the background workers")
+        start_background_workers(db_path, music_roots, enable_watcher, enable_cover_fetch, bump_socket=bump_socket)
+    
+    return post_worker_init
+
+
+def run_server(db_path: str, host: str, port: int, debug: bool, music_roots: List[str], enable_watcher: bool = True,
+               enable_cover_fetch: bool = True, server: str = 'dev', threads: int = 8, workers: int = 4) -> None:
     # Lazy import to prevent Flask dependency for pure scan usage
     from app import app
     app.config['DB_PATH'] = db_path
-    # Ensure MUSIC_ROOT available to app endpoints (e.g., rescan)
-    if 'MUSIC_ROOT' not in app.config:
-        app.config['MUSIC_ROOT'] = music_root
+    # Ensure MUSIC_ROOTS available to app endpoints (e.g., rescan)
+    if 'MUSIC_ROOTS' not in app.config:
+        app.config['MUSIC_ROOTS'] = music_roots
     
-    # Start file watcher if enabled
-    watcher = None
-    if enable_watcher:
-        db = AlbumDatabase(db_path)
-        watcher = start_watcher(music_root, db, scan_delay=5)
+    if server == 'prefork':
+        # No background threads in the gunicorn master: a worker forked while
+        # one of them holds a lock would inherit that lock held forever.
+        # They are started after the fork, in one worker.
+        post_worker_init = prefork_background_hook(db_path, music_roots, enable_watcher, enable_cover_fetch)
+        serve_wsgi(app, server, host, port, debug, threads=threads, workers=workers,
+                   post_worker_init=post_worker_init)
+        return
     
-    # Disable auto-reloader to avoid duplicate logs and infinite startup loops
+    stop_background_workers = start_background_workers(db_path, music_roots, enable_watcher, enable_cover_fetch)
     try:
-        app.run(debug=debug, host=host, port=port, use_reloader=False)
+        serve_wsgi(app, server, host, port, debug, threads=threads, workers=workers)
     finally:
-        # Clean up watcher on shutdown
-        if watcher:
-            watcher.stop()
-            watcher.join()
+        # Clean up background workers on shutdown
+        stop_background_workers()
 
 
 def main() -> None:
     # Zero-argument entrypoint. Configure via environment variables if needed.
+    # MUSIC_ROOT may list several roots separated by os.pathsep (';' on Windows)
     music_root = os.environ.get("MUSIC_ROOT", r"D:\\Music")
+    music_roots = parse_music_roots(music_root)
     db_path = os.environ.get("DB_PATH", "albums.db")
     host = os.environ.get("HOST", "0.0.0.0")
     port = int(os.environ.get("PORT", "5001"))
     debug = os.environ.get("DEBUG", "false").lower() in {"1", "true", "yes"}
     enable_watcher = os.environ.get("ENABLE_WATCHER", "true").lower() in {"1", "true", "yes"}
-
-    # Do not scan on startup; only via the UI button/endpoint.
+    enable_cover_fetch = os.environ.get("ENABLE_COVER_FETCH", "true").lower() in {"1", "true", "yes"}
+    server = os.environ.get("SERVER", "dev").lower()
+    threads = int(os.environ.get("SERVER_THREADS", "8"))
+    workers = int(os.environ.get("SERVER_WORKERS", "4"))
+    
+    # No full scan on startup (use the UI button/endpoint); run_server only
+    # resumes a scan that was interrupted, and watchers pick up new albums.
     # Ensure MUSIC_ROOT is available to the Flask app for on-demand rescans.
     os.environ["MUSIC_ROOT"] = music_root
-    run_server(db_path, host, port, debug, music_root, enable_watcher)
+    run_server(db_path, host, port, debug, music_roots, enable_watcher, enable_cover_fetch,
+               server=server, threads=threads, workers=workers)
 
 
 if __name__ == "__main__":
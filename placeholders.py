@@ -0,0 +1,107 @@
+import math
+from typing import Optional, Tuple
+from PIL import Image
+
+# Thumbnail size the placeholder is computed from; plenty for a 4x3 blurhash
+THUMBNAIL_SIZE = 32
+BLURHASH_COMPONENTS = (4, 3)
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def encode_blurhash(image: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    """Encode a (small) RGB image as a blurhash string (see blurha.sh)"""
+    width, height = image.size
+    linear = [tuple(_srgb_to_linear(c) for c in pixel) for pixel in image.getdata()]
+    
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+    
+    dc, ac = factors[0], factors[1:]
+    blurhash = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        blurhash += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        blurhash += _encode83(0, 1)
+    
+    r, g, b = (_linear_to_srgb(c) for c in dc)
+    blurhash += _encode83((r << 16) + (g << 8) + b, 4)
+    
+    for factor in ac:
+        r, g, b = (max(0, min(18, int(math.floor(_sign_pow(c / max_value, 0.5) * 9 + 9.5)))) for c in factor)
+        blurhash += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    
+    return blurhash
+
+
+def dominant_color(image: Image.Image) -> str:
+    """Most common color of a small RGB image after quantizing, as '#rrggbb'"""
+    quantized = image.quantize(colors=8)
+    _, index = max(quantized.getcolors())
+    palette = quantized.getpalette()
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def compute_placeholder(cover_path: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Compute (dominant_color, blurhash) for a cover image, or (None, None) if unreadable"""
+    if not cover_path:
+        return None, None
+    try:
+        with Image.open(cover_path) as img:
+            img.draft('RGB', (THUMBNAIL_SIZE, THUMBNAIL_SIZE))  # cheap JPEG downscale on decode
+            thumbnail = img.convert('RGB').resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        return dominant_color(thumbnail), encode_blurhash(thumbnail, *BLURHASH_COMPONENTS)
+    except Exception as e:
+        print(f"Error computing placeholder for {cover_path}: {e}")
+        return None, None
+
+
+if __name__ == "__main__":
+    import sys
+    from database import AlbumDatabase
+    
+    # Backfill placeholders for existing rows: python placeholders.py [limit]
+    db = AlbumDatabase("albums.db")
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    db.backfill_placeholders(limit=limit)
@@ -1,16 +1,26 @@
 import os
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List, Dict, Iterator
 import mutagen
 from mutagen.id3 import ID3
 from mutagen.flac import FLAC
 from mutagen.mp4 import MP4
 from database import AlbumDatabase
+from placeholders import compute_placeholder
+from tag_probe import probe_tags, NO_TAG_EXTENSIONS
+
+SCAN_BATCH_SIZE = 200  # albums per commit/checkpoint
+
 
 class MusicScanner:
-    def __init__(self, music_root: str, db: AlbumDatabase):
+    def __init__(self, music_root: str, db: AlbumDatabase, fast_tags: bool = True):
         self.music_root = Path(music_root)
         self.db = db
+        # Probe only the tag region of audio files, parsing in full only when needed
+        self.fast_tags = fast_tags
         self.image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
     
     def find_album_cover(self, album_folder: Path) -> Optional[str]:
@@ -34,6 +44,11 @@ class MusicScanner:
     
     def extract_metadata_from_file(self, file_path: Path) -> Tuple[Optional[str], Optional[str]]:
         """Extract genre and release date from audio file"""
+        if self.fast_tags:
+            tags = probe_tags(file_path)
+            if tags is not None:
+                return tags
+        
         try:
             audio = mutagen.File(file_path, easy=True)
             if audio is None:
@@ -60,6 +75,9 @@ class MusicScanner:
     def get_metadata_from_folder(self, album_folder: Path) -> Tuple[Optional[str], Optional[str]]:
         """Extract metadata from any audio file in the album folder"""
         audio_extensions = {'.mp3', '.flac', '.m4a', '.ogg', '.wav', '.wma', '.aac'}
+        if self.fast_tags:
+            # Files without usable tags can never answer; don't open them at all
+            audio_extensions -= NO_TAG_EXTENSIONS
         
         for file in album_folder.iterdir():
             if file.is_file() and file.suffix.lower() in audio_extensions:
@@ -69,35 +87,42 @@ class MusicScanner:
         
         return None, None
     
-    def scan(self):
-        """Scan the music directory recursively and populate the database.
-        Any directory containing audio files is considered an album folder.
-        Artist and genre are inferred heuristically from parent folders or audio tags."""
-        if not self.music_root.exists():
-            print(f"Error: Music root directory does not exist: {self.music_root}")
-            return
-        
-        added_count = 0
-        skipped_count = 0
-        error_count = 0
+    def _walk_key(self, folder: Path) -> Tuple[str, ...]:
+        """Position of a folder in the sorted, top-down walk order"""
+        return folder.relative_to(self.music_root).parts
+    
+    def iter_albums(self, resume_after: Optional[str] = None) -> Iterator[Dict]:
+        """Walk the music directory and yield add_album() arguments for every album folder.
+        Only touches the filesystem, so several roots can be walked in parallel
+        while a single writer inserts the results. Per-folder errors are counted
+        in self.error_count; self.walk_completed tells whether the walk finished.
         
-        print(f"Scanning music directory recursively: {self.music_root}\n")
+        Folders are visited in sorted pre-order, so a checkpointed folder
+        (resume_after) pins down the walk frontier: every subtree ordered
+        before it is pruned and walking picks up right after it.
+        """
+        self.error_count = 0
+        self.walk_completed = False
+        resume_key = self._walk_key(Path(resume_after)) if resume_after else None
         
         # Audio file extensions to detect album folders
         audio_extensions = {'.mp3', '.flac', '.m4a', '.ogg', '.wav', '.wma', '.aac'}
         
-        def folder_has_audio(folder: Path) -> bool:
-            try:
-                for entry in folder.iterdir():
-                    if entry.is_file() and entry.suffix.lower() in audio_extensions:
-                        return True
-                return False
-            except Exception:
-                return False
-        
         try:
             for dirpath, dirnames, filenames in os.walk(self.music_root):
                 album_folder = Path(dirpath)
+                dirnames.sort()
+                
+                if resume_key is not None:
+                    key = self._walk_key(album_folder)
+                    # Prune subtrees walked completely before the checkpoint
+                    dirnames[:] = [
+                        d for d in dirnames
+                        if not (key + (d,) < resume_key and resume_key[:len(key) + 1] != key + (d,))
+                    ]
+                    if key <= resume_key:
+                        continue
+                
                 # Quickly skip extremely deep system folders
                 if album_folder.name.startswith('.'):
                     continue
@@ -119,48 +144,220 @@ class MusicScanner:
                     fallback_genre = album_folder.parent.parent.name if album_folder.parent.parent != album_folder.parent else None
                     final_genre = extracted_genre if extracted_genre else fallback_genre
                     
-                    album_id = self.db.add_album(
-                        genre=final_genre,
-                        artist=artist_name,
-                        album=album_name,
-                        folder_path=str(album_folder),
-                        release_date=release_date,
-                        cover_path=cover_path
-                    )
-                    
-                    if album_id > 0:
-                        added_count += 1
-                        if added_count % 200 == 0:
-                            print(f"  Progress: {added_count} albums added...")
-                    else:
-                        skipped_count += 1
+                    # Placeholder color/blurhash are computed once here, off the DB writer
+                    dominant_color, blurhash = compute_placeholder(cover_path)
                 except Exception as e:
-                    error_count += 1
+                    self.error_count += 1
                     print(f"  ERROR processing album folder {album_folder}: {e}")
-        
+                    continue
+                
+                yield {
+                    'genre': final_genre,
+                    'artist': artist_name,
+                    'album': album_name,
+                    'folder_path': str(album_folder),
+                    'release_date': release_date,
+                    'cover_path': cover_path,
+                    'dominant_color': dominant_color,
+                    'blurhash': blurhash
+                }
+            
+            self.walk_completed = True
         except Exception as e:
             print(f"\nFATAL ERROR during scan: {e}")
             import traceback
             traceback.print_exc()
+    
+    def scan(self, resume: bool = False):
+        """Scan the music directory recursively and populate the database.
+        Any directory containing audio files is considered an album folder.
+        Artist and genre are inferred heuristically from parent folders or audio tags.
+        With resume=True, continues from the checkpoint of an interrupted scan."""
+        if not self.music_root.exists():
+            print(f"Error: Music root directory does not exist: {self.music_root}")
+            return
+        
+        added_count, skipped_count, _ = scan_roots([str(self.music_root)], self.db, resume=resume, fast_tags=self.fast_tags)
+        return added_count, skipped_count
+
+
+def parse_music_roots(value: str) -> List[str]:
+    """Split a MUSIC_ROOT(S) setting into distinct roots.
+    Roots are separated by os.pathsep (';' on Windows, ':' elsewhere)."""
+    roots = []
+    for root in value.split(os.pathsep):
+        root = root.strip()
+        if root and root not in roots:
+            roots.append(root)
+    return roots
+
+
+# Roots with a scan_roots() run in progress in this process; a root is never
+# walked by two scans at once (they would share its checkpoint row)
+_active_roots = set()
+_active_roots_lock = threading.Lock()
+
+
+def is_scan_active(music_root: str) -> bool:
+    """Whether a scan of music_root is running in this process"""
+    with _active_roots_lock:
+        return os.path.normpath(music_root) in _active_roots
+
+
+def scan_roots(music_roots: List[str], db: AlbumDatabase, resume: bool = False,
+               batch_size: int = SCAN_BATCH_SIZE, fast_tags: bool = True) -> Tuple[int, int, Dict[str, Dict]]:
+    """Scan several music roots in parallel and populate the database.
+    Roots that another scan in this process is already walking are skipped.
+    Each root is walked by its own thread, so independent disks are read
+    concurrently; all inserts go through this thread as the single DB writer.
+    
+    Albums are committed in batches, each together with a per-root checkpoint
+    (last committed folder). With resume=True, roots that have a checkpoint
+    continue after it instead of starting from the top. A root's checkpoint is
+    cleared only once its walk finishes, and the shuffle runs only when every
+    walk has finished. fast_tags selects the bounded-I/O tag probe (see
+    MusicScanner); pass False to parse every audio file in full.
+    
+    Returns:
+        (added, skipped, per-root stats with album counts and walk time)
+    """
+    with _active_roots_lock:
+        busy = [root for root in music_roots if os.path.normpath(root) in _active_roots]
+        music_roots = [root for root in music_roots if root not in busy]
+        _active_roots.update(os.path.normpath(root) for root in music_roots)
+    for root in busy:
+        print(f"Skipping {root}: a scan of it is already running")
+    if not music_roots:
+        return 0, 0, {}
+    
+    try:
+        return _scan_roots(music_roots, db, resume, batch_size, fast_tags)
+    finally:
+        with _active_roots_lock:
+            _active_roots.difference_update(os.path.normpath(root) for root in music_roots)
+
+
+def _scan_roots(music_roots: List[str], db: AlbumDatabase, resume: bool,
+                batch_size: int, fast_tags: bool) -> Tuple[int, int, Dict[str, Dict]]:
+    records = queue.Queue(maxsize=1000)
+    walk_done = object()
+    root_stats = {root: {'added': 0, 'skipped': 0, 'errors': 0, 'seconds': 0.0, 'completed': False}
+                  for root in music_roots}
+    checkpoints = {}
+    missing_roots = set()
+    
+    for root in music_roots:
+        checkpoint = db.get_scan_checkpoint(root) if resume else None
+        if checkpoint:
+            checkpoints[root] = checkpoint
+            # Count what the interrupted run already committed towards this scan
+            root_stats[root]['added'] = checkpoint['added']
+            root_stats[root]['skipped'] = checkpoint['skipped']
+        else:
+            db.clear_scan_checkpoint(root)
+    
+    def walk_root(root: str):
+        scanner = MusicScanner(root, db, fast_tags=fast_tags)
+        start = time.time()
+        try:
+            if not scanner.music_root.exists():
+                # Keep any checkpoint: the disk may just be unmounted
+                print(f"Error: Music root directory does not exist: {root}")
+                root_stats[root]['errors'] += 1
+                missing_roots.add(root)
+                return
+            resume_after = checkpoints[root]['last_folder'] if root in checkpoints else None
+            for record in scanner.iter_albums(resume_after=resume_after):
+                records.put((root, record))
+            root_stats[root]['errors'] += scanner.error_count
+            root_stats[root]['completed'] = scanner.walk_completed
+        finally:
+            root_stats[root]['seconds'] = time.time() - start
+            records.put((root, walk_done))
+    
+    def commit_batch(root: str, batch: List[Dict]):
+        stats = root_stats[root]
+        try:
+            album_ids = db.add_albums(batch)
+        except Exception as e:
+            stats['errors'] += len(batch)
+            print(f"  ERROR committing {len(batch)} albums from {root}: {e}")
+            return
         
-        print(f"\n" + "="*50)
-        print(f"SCAN COMPLETE!")
-        print(f"="*50)
-        print(f"Added: {added_count} albums")
-        print(f"Skipped (already exists): {skipped_count} albums")
-        print(f"Errors: {error_count}")
-        print(f"Total processed: {added_count + skipped_count}")
+        for album_id in album_ids:
+            if album_id > 0:
+                stats['added'] += 1
+                if stats['added'] % 200 == 0:
+                    print(f"  [{root}] Progress: {stats['added']} albums added...")
+            else:
+                stats['skipped'] += 1
         
-        if added_count > 0:
-            print("\nShuffling album display order...")
-            self.db.shuffle_display_order()
+        # Saved right after the batch commit; a crash in between only means the
+        # batch is walked again on resume and skipped as already existing
+        db.save_scan_checkpoint(root, batch[-1]['folder_path'], stats['added'], stats['skipped'])
+    
+    print(f"Scanning {len(music_roots)} music root(s) in parallel:")
+    for root in music_roots:
+        resumed = f" (resuming after {checkpoints[root]['last_folder']})" if root in checkpoints else ""
+        print(f"  - {root}{resumed}")
+    print()
+    
+    start = time.time()
+    workers = [threading.Thread(target=walk_root, args=(root,), daemon=True) for root in music_roots]
+    for worker in workers:
+        worker.start()
+    
+    pending = {root: [] for root in music_roots}
+    remaining = len(workers)
+    while remaining:
+        root, record = records.get()
+        stats = root_stats[root]
+        if record is walk_done:
+            remaining -= 1
+            if pending[root]:
+                commit_batch(root, pending[root])
+                pending[root] = []
+            if stats['completed']:
+                db.clear_scan_checkpoint(root)
+            print(f"  [{root}] walk {'finished' if stats['completed'] else 'interrupted'} in {stats['seconds']:.1f}s: "
+                  f"{stats['added']} added, {stats['skipped']} skipped, {stats['errors']} errors")
+            continue
         
-        return added_count, skipped_count
+        pending[root].append(record)
+        if len(pending[root]) >= batch_size:
+            commit_batch(root, pending[root])
+            pending[root] = []
+    
+    added_count = sum(s['added'] for s in root_stats.values())
+    skipped_count = sum(s['skipped'] for s in root_stats.values())
+    error_count = sum(s['errors'] for s in root_stats.values())
+    walks_completed = all(stats['completed'] for root, stats in root_stats.items() if root not in missing_roots)
+    elapsed = time.time() - start
+    
+    print(f"\n" + "="*50)
+    print(f"SCAN COMPLETE!" if walks_completed else f"SCAN INCOMPLETE (resume to continue)")
+    print(f"="*50)
+    for root, stats in root_stats.items():
+        print(f"{root}: {stats['added']} added, {stats['skipped']} skipped, "
+              f"{stats['errors']} errors in {stats['seconds']:.1f}s")
+    print(f"Added: {added_count} albums")
+    print(f"Skipped (already exists): {skipped_count} albums")
+    print(f"Errors: {error_count}")
+    print(f"Total processed: {added_count + skipped_count} in {elapsed:.1f}s")
+    
+    if added_count > 0 and walks_completed:
+        print("\nShuffling album display order...")
+        db.shuffle_display_order()
+    
+    return added_count, skipped_count, root_stats
 
 if __name__ == "__main__":
     # Initialize database
     db = AlbumDatabase("albums.db")
     
-    # Scan music directory
-    scanner = MusicScanner(r"D:\Music", db)
-    scanner.scan()
+    # Scan music directories (MUSIC_ROOT may list several roots);
+    # pass --resume to continue an interrupted scan from its checkpoint,
+    # --full-tags to parse every audio file with mutagen instead of probing tags
+    import sys
+    scan_roots(parse_music_roots(os.environ.get("MUSIC_ROOT", r"D:\Music")), db,
+               resume='--resume' in sys.argv, fast_tags='--full-tags' not in sys.argv)
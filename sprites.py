@@ -0,0 +1,117 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+from PIL import Image
+
+SPRITE_TILE_SIZES = {32, 64, 100, 128, 160, 200, 256}
+MAX_CACHED_SPRITES = 200
+MAX_SPRITE_TILES = 200  # covers per sheet; bounds decode work and sheet size per request
+
+
+class SpriteBuilder:
+    """Build and cache sprite sheets holding the covers of one grid page"""
+    
+    def __init__(self, cache_dir: str = "sprites", max_cached: int = MAX_CACHED_SPRITES):
+        """
+        Args:
+            cache_dir: Directory where sprite images and offset maps are cached
+            max_cached: Number of sprites kept before the oldest are pruned
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.max_cached = max_cached
+    
+    def _page_key(self, albums: List[Dict], tile_size: int) -> str:
+        """Hash the page content: tile size, album order, cover paths and cover mtimes.
+        Any change to a member cover or to the page order yields a new key."""
+        digest = hashlib.sha1(str(tile_size).encode())
+        for album in albums:
+            cover_path = album.get('cover_path') or ''
+            try:
+                mtime = os.stat(cover_path).st_mtime_ns if cover_path else 0
+            except OSError:
+                mtime = 0
+            digest.update(f"\0{album['id']}\0{cover_path}\0{mtime}".encode())
+        return digest.hexdigest()
+    
+    def get_sprite(self, albums: List[Dict], tile_size: int) -> Dict:
+        """Return the sprite for a page of albums, building it on a cache miss.
+        
+        Returns:
+            Dict with the sprite name, tile size, sheet dimensions and an
+            offset map of album id -> [x, y] (albums without a readable cover are omitted)
+        """
+        key = self._page_key(albums, tile_size)
+        map_path = self.cache_dir / f"{key}.json"
+        
+        if map_path.exists():
+            with open(map_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        
+        sprite = self._build(albums, tile_size, key)
+        self._write_atomic(map_path, json.dumps(sprite).encode('utf-8'))
+        self._prune()
+        return sprite
+    
+    def sprite_path(self, name: str) -> Optional[Path]:
+        """Resolve a sprite file name to its cached path"""
+        path = self.cache_dir / Path(name).name
+        return path.resolve() if path.exists() else None
+    
+    def _build(self, albums: List[Dict], tile_size: int, key: str) -> Dict:
+        tiles = []
+        for album in albums:
+            cover_path = album.get('cover_path')
+            if not cover_path:
+                continue
+            try:
+                with Image.open(cover_path) as img:
+                    img.draft('RGB', (tile_size, tile_size))  # cheap JPEG downscale on decode
+                    tiles.append((album['id'], img.convert('RGB').resize((tile_size, tile_size))))
+            except Exception as e:
+                print(f"Error adding cover to sprite for album {album['id']}: {e}")
+        
+        columns = max(1, math.ceil(math.sqrt(len(tiles))))
+        rows = max(1, math.ceil(len(tiles) / columns))
+        sheet = Image.new('RGB', (columns * tile_size, rows * tile_size))
+        
+        offsets = {}
+        for index, (album_id, tile) in enumerate(tiles):
+            x = (index % columns) * tile_size
+            y = (index // columns) * tile_size
+            sheet.paste(tile, (x, y))
+            offsets[album_id] = [x, y]
+        
+        name = f"{key}.jpg"
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            sheet.save(f, 'JPEG', quality=85)
+        os.replace(tmp_name, self.cache_dir / name)
+        
+        return {
+            'sprite': name,
+            'tile_size': tile_size,
+            'width': sheet.width,
+            'height': sheet.height,
+            'offsets': offsets
+        }
+    
+    def _write_atomic(self, path: Path, data: bytes):
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    
+    def _prune(self):
+        """Drop the least recently built sprites beyond max_cached"""
+        maps = sorted(self.cache_dir.glob('*.json'), key=lambda p: p.stat().st_mtime)
+        for map_path in maps[:max(0, len(maps) - self.max_cached)]:
+            for path in (map_path, map_path.with_suffix('.jpg')):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
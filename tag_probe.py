@@ -0,0 +1,240 @@
+"""
+Bounded-I/O tag probing for the scanner's fast mode.
+
+Reads only the tag region of a file (ID3v2 header, FLAC metadata blocks, MP4
+moov/udta/meta/ilst, Ogg comment header) under a per-file byte budget, seeking
+over everything else (audio data, embedded pictures). Keys match what
+mutagen.File(..., easy=True) exposes, so results agree with a full parse.
+"""
+import struct
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+from mutagen._vorbis import VCommentDict
+from mutagen.easyid3 import EasyID3
+
+# Maximum bytes read from one file while probing
+TAG_PROBE_BUDGET = 256 * 1024
+
+# Formats whose tags mutagen's easy interface never maps to genre/date
+# (WAV ID3 chunks and ASF attributes keep their raw frame names); not worth opening
+NO_TAG_EXTENSIONS = {'.wav', '.wma'}
+
+# Extensions mutagen reads as MP3 when the file starts with an ID3 tag
+ID3_EXTENSIONS = {'.mp3', '.aac'}
+
+DATE_TAGS = ('date', 'year', 'originaldate')
+
+Tags = Tuple[Optional[str], Optional[str]]
+
+
+class ProbeFailed(Exception):
+    """The tag region could not be read within the budget; a full parse is needed"""
+
+
+class _BudgetReader:
+    """File wrapper that counts bytes read against a budget; seeks are free"""
+    
+    def __init__(self, f: BinaryIO, budget: int):
+        self.f = f
+        self.remaining = budget
+    
+    def read(self, size: int) -> bytes:
+        if size > self.remaining:
+            raise ProbeFailed("tag region exceeds probe budget")
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+    
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) != size:
+            raise ProbeFailed("unexpected end of file")
+        return data
+    
+    def skip(self, size: int):
+        self.f.seek(size, 1)
+
+
+def _first(values) -> Optional[str]:
+    if not values:
+        return None
+    return str(values[0]) if isinstance(values, list) else str(values)
+
+
+def _from_mapping(tags) -> Tags:
+    """Pick genre and release date the same way the scanner does for easy tags"""
+    genre = _first(tags['genre']) if 'genre' in tags else None
+    release_date = None
+    for date_tag in DATE_TAGS:
+        if date_tag in tags:
+            release_date = _first(tags[date_tag])
+            break
+    return genre, release_date
+
+
+def _probe_id3(reader: _BudgetReader, head: bytes, suffix: str) -> Tags:
+    # ID3v2 header: 'ID3', version (2), flags (1), syncsafe size (4); size excludes the header
+    size = 0
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7f)
+    if size < len(head) - 10:
+        raise ProbeFailed("ID3 tag smaller than its header read")
+    tag = head + reader.read_exact(10 + size - len(head))
+    if head[5] & 0x10:  # footer present
+        reader.skip(10)
+    
+    # Some taggers put an ID3 tag in front of FLAC; mutagen then reads the FLAC
+    # metadata and ignores the ID3 tag
+    after = reader.read(4)
+    if after == b'fLaC' and suffix == '.flac':
+        return _probe_flac(reader)
+    # Otherwise mutagen only reads the ID3 tag as an MP3, which needs an MPEG
+    # audio frame sync (layer bits non-zero, unlike ADTS) right after it
+    if (suffix not in ID3_EXTENSIONS or len(after) < 2
+            or after[0] != 0xff or after[1] & 0xe0 != 0xe0 or not after[1] & 0x06):
+        raise ProbeFailed("no MPEG audio frame after the ID3 tag")
+    return _from_mapping(EasyID3(BytesIO(tag)))
+
+
+def _probe_flac(reader: _BudgetReader) -> Tags:
+    while True:
+        block_header = reader.read_exact(4)
+        is_last = block_header[0] & 0x80
+        block_type = block_header[0] & 0x7f
+        length = int.from_bytes(block_header[1:4], 'big')
+        if block_type == 4:  # VORBIS_COMMENT
+            return _from_mapping(VCommentDict(reader.read_exact(length), framing=False))
+        reader.skip(length)
+        if is_last:
+            return None, None
+
+
+def _iter_atoms(reader: _BudgetReader, end: Optional[int], f: BinaryIO):
+    """Yield (name, payload size) of MP4 atoms up to end, leaving the file at each payload"""
+    while end is None or f.tell() + 8 <= end:
+        header = reader.read(8)
+        if len(header) < 8:
+            return
+        size, name = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', reader.read_exact(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = (end - f.tell() + 8) if end is not None else None
+        if size is not None and size < header_size:
+            raise ProbeFailed("malformed MP4 atom")
+        payload_start = f.tell()
+        payload_size = size - header_size if size is not None else None
+        yield name, payload_size
+        if payload_size is None:
+            return
+        f.seek(payload_start + payload_size)
+
+
+def _find_atom(reader: _BudgetReader, f: BinaryIO, path, end: Optional[int]) -> Optional[int]:
+    """Descend along atom names in path; returns the payload size of the last one"""
+    for wanted in path:
+        for name, payload_size in _iter_atoms(reader, end, f):
+            if name == wanted:
+                end = f.tell() + payload_size
+                if wanted == b'meta':
+                    reader.skip(4)  # full atom: version + flags
+                break
+        else:
+            return None
+    return end - f.tell()
+
+
+def _probe_mp4(reader: _BudgetReader, f: BinaryIO) -> Tags:
+    f.seek(0)
+    ilst_size = _find_atom(reader, f, (b'moov', b'udta', b'meta', b'ilst'), None)
+    if ilst_size is None:
+        return None, None
+    
+    ilst = reader.read_exact(ilst_size)
+    items = {}
+    offset = 0
+    while offset + 8 <= len(ilst):
+        size, name = struct.unpack('>I4s', ilst[offset:offset + 8])
+        if size < 8:
+            break
+        item = ilst[offset + 8:offset + size]
+        # First 'data' child: size, 'data', type (4), locale (4), payload
+        if len(item) >= 16 and item[4:8] == b'data':
+            data_size = struct.unpack('>I', item[:4])[0]
+            items[name] = item[16:data_size].decode('utf-8', 'replace')
+        offset += size
+    
+    # Same keys EasyMP4 maps to genre and date
+    return items.get(b'\xa9gen'), items.get(b'\xa9day')
+
+
+def _probe_ogg(reader: _BudgetReader, f: BinaryIO) -> Tags:
+    # Reassemble the second packet of the stream (the comment header) from its
+    # pages; it usually fits in the first few KB unless it embeds pictures
+    f.seek(0)
+    packets = [b'']
+    while len(packets) < 3:
+        header = reader.read_exact(27)
+        if header[:4] != b'OggS':
+            raise ProbeFailed("lost Ogg page sync")
+        segments = reader.read_exact(header[26])
+        data = reader.read_exact(sum(segments))
+        offset = 0
+        for length in segments:
+            packets[-1] += data[offset:offset + length]
+            offset += length
+            if length < 255:
+                packets.append(b'')
+    
+    comment = packets[1]
+    for marker in (b'\x03vorbis', b'OpusTags'):
+        if comment.startswith(marker):
+            return _from_mapping(VCommentDict(comment[len(marker):], framing=False))
+    raise ProbeFailed("unsupported Ogg codec")
+
+
+def _probe_tail(f: BinaryIO) -> Optional[Tags]:
+    # No tag header up front (bare MPEG/ADTS frames, broken files): the only tag
+    # mutagen could still find is an ID3v1 (or appended ID3v2) block at the end
+    f.seek(0, 2)
+    if f.tell() < 128:
+        return None, None
+    f.seek(-128, 2)
+    if f.read(3) == b'TAG':
+        return None
+    f.seek(-10, 2)
+    return None if f.read(3) == b'3DI' else (None, None)
+
+
+def probe_tags(file_path: Path, budget: int = TAG_PROBE_BUDGET) -> Optional[Tags]:
+    """Read (genre, release_date) from a file's tag region with bounded I/O.
+    
+    Returns:
+        (genre, release_date) when the tag region was read (values may be None
+        if the file has no such tags), or None when a full parse is needed
+        (trailing ID3 tag, ID3 tag ahead of anything but MPEG frames or FLAC,
+        oversized or malformed tag region)
+    """
+    if Path(file_path).suffix.lower() in NO_TAG_EXTENSIONS:
+        return None, None
+    
+    try:
+        with open(file_path, 'rb') as f:
+            reader = _BudgetReader(f, budget)
+            head = reader.read(12)
+            if head[:3] == b'ID3' and len(head) >= 10:
+                return _probe_id3(reader, head, Path(file_path).suffix.lower())
+            if head[:4] == b'fLaC':
+                f.seek(4)
+                return _probe_flac(reader)
+            if head[4:8] == b'ftyp':
+                return _probe_mp4(reader, f)
+            if head[:4] == b'OggS':
+                return _probe_ogg(reader, f)
+            return _probe_tail(f)
+    except Exception:
+        # Budget exceeded, truncated or malformed tags: leave it to mutagen
+        return None
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Add parent directory to path so we can import app modules
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
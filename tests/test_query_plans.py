@@ -0,0 +1,147 @@
+"""
+Query plan regression tests for the hot album queries.
+
+Each test runs the real code path (app endpoints, CoverFetcher, watcher-side
+database helpers) against a populated library, captures the SQL it issues
+through a trace callback, and checks the EXPLAIN QUERY PLAN of every albums
+statement: no table scans, no temp b-tree sorts, and the index the path was
+built for. Every check runs with and without ANALYZE statistics.
+"""
+import os
+import random
+import re
+import sqlite3
+
+import pytest
+from PIL import Image
+
+import app as app_module
+from cover_fetcher import CoverFetcher
+from database import AlbumDatabase, MISSING_COVER
+
+ALBUM_COUNT = 3000
+GENRES = ['Rock', 'Jazz', 'Electronic', 'Classical', 'Hip-Hop', 'Folk']
+
+# Statements reading or writing the albums table
+ALBUMS_STATEMENT = re.compile(r'\s*(SELECT\b.*\bFROM albums\b|UPDATE albums\b|DELETE FROM albums\b)',
+                              re.IGNORECASE | re.DOTALL)
+
+
+def build_library(db_path: str, album_count: int, analyze: bool) -> AlbumDatabase:
+    """Shuffled library with facets, shared albums and a third of covers missing"""
+    db = AlbumDatabase(db_path)
+    rng = random.Random(42)
+    albums = []
+    for i in range(album_count):
+        albums.append({
+            'genre': GENRES[i % len(GENRES)],
+            'artist': f"Artist {i % 400}",
+            'album': f"Album {i}",
+            'folder_path': f"/music/Artist {i % 400}/Album {i}",
+            'release_date': str(1960 + rng.randrange(60)),
+            'cover_path': None if i % 3 == 0 else f"covers/album_{i}.jpg",
+        })
+    db.add_albums(albums)
+    db.shuffle_display_order()
+    
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE albums SET shared = 1 WHERE id % 7 = 0")
+    if analyze:
+        conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return db
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['no-stats', 'analyzed'])
+def db(request, tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp('plans') / 'library.db')
+    return build_library(db_path, ALBUM_COUNT, analyze=request.param)
+
+
+@pytest.fixture
+def issued_sql(monkeypatch):
+    """Every statement run through sqlite3.connect connections while the test runs"""
+    statements = []
+    connect = sqlite3.connect
+    
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+    
+    monkeypatch.setattr(sqlite3, 'connect', traced_connect)
+    return statements
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(app_module, '_db', db)
+    monkeypatch.setattr(app_module, '_cover_scheduler', None)
+    return app_module.app.test_client()
+
+
+def assert_indexed(db: AlbumDatabase, statements, index: str = None):
+    """Check the plan of every albums statement issued; index is a substring
+    (e.g. 'idx_missing_cover') each of their plans must use"""
+    statements = [sql for sql in list(statements) if ALBUMS_STATEMENT.match(sql)]
+    assert statements, "no albums statement was issued"
+    for sql in statements:
+        plan = db.explain(sql)
+        for step in plan:
+            assert not (step.startswith('SCAN albums') and 'COVERING INDEX' not in step), (sql, plan)
+            assert 'TEMP B-TREE' not in step, (sql, plan)
+        if index:
+            assert any(index in step for step in plan), (sql, plan)
+
+
+@pytest.mark.parametrize('query, index', [
+    ('page=3', 'idx_shared_display_order'),
+    ('page=2&per_page=50&filter_shared=shared', 'idx_shared_display_order'),
+    ('search=artist 12', 'idx_shared_display_order'),
+    ('genre=Jazz', 'idx_facet_genre'),
+    ('artist=Artist 7', 'idx_facet_artist'),
+    ('decade=1990', 'idx_facet_decade'),
+])
+def test_albums_page(db, client, issued_sql, query, index):
+    response = client.get(f'/api/albums?{query}')
+    assert response.status_code == 200
+    assert_indexed(db, issued_sql, index)
+
+
+@pytest.mark.parametrize('query', ['', 'filter_shared=shared', 'limit=10'])
+def test_facets(db, client, issued_sql, query):
+    response = client.get(f'/api/facets?{query}')
+    assert response.status_code == 200
+    assert_indexed(db, issued_sql, 'idx_facet_')
+
+
+def test_stats(db, client, issued_sql):
+    assert client.get('/api/stats').status_code == 200
+    assert_indexed(db, issued_sql, 'idx_artist_stats')
+
+
+def test_missing_cover_backlog(db, issued_sql, tmp_path):
+    fetcher = CoverFetcher(db, covers_dir=str(tmp_path / 'covers'))
+    albums = list(fetcher._iter_missing_covers())
+    assert len(albums) == db.count_albums(MISSING_COVER)
+    assert_indexed(db, [sql for sql in issued_sql if 'COUNT(' not in sql], 'idx_missing_cover')
+
+
+def test_fetch_cover(db, issued_sql, tmp_path, monkeypatch):
+    cover = tmp_path / 'cover.jpg'
+    Image.new('RGB', (8, 8), (200, 30, 30)).save(cover)
+    fetcher = CoverFetcher(db, covers_dir=str(tmp_path / 'covers'))
+    monkeypatch.setattr(fetcher, '_find_artwork', lambda artist, album: 'http://artwork.invalid/600x600bb.jpg')
+    monkeypatch.setattr(fetcher, '_download_artwork', lambda url, album_id, artist, album: str(cover))
+    album = next(db.iter_albums(columns=('id', 'artist', 'album'), where=MISSING_COVER))
+    
+    issued_sql.clear()
+    assert fetcher.fetch_cover(album.id, album.artist, album.album) == str(cover)
+    assert_indexed(db, issued_sql)
+
+
+def test_folder_move_and_delete(db, issued_sql):
+    assert db.move_folder('/music/Artist 5', '/music/Artist 5 (moved)') > 0
+    assert db.delete_folder('/music/Artist 6') > 0
+    assert_indexed(db, issued_sql, 'sqlite_autoindex_albums')
@@ -4,12 +4,12 @@ import time
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from scanner import MusicScanner
+from scanner import MusicScanner, is_scan_active
 from database import AlbumDatabase
 
 
 class AlbumWatcher(FileSystemEventHandler):
-    """Watch for new album folders in the music directory"""
+    """Watch the music directory for new, moved and deleted album folders"""
     
     def __init__(self, music_root: str, db: AlbumDatabase, scan_delay: int = 5):
         """
@@ -69,9 +69,52 @@ class AlbumWatcher(FileSystemEventHandler):
             self._handle_change(Path(event.src_path))
     
     def on_moved(self, event):
-        """Handle file/directory move events"""
-        if event.is_directory and event.dest_path:
-            self._handle_change(Path(event.dest_path))
+        """Handle file/directory move events.
+        Moves inside the library rewrite stored paths in place; moves out of it
+        drop the affected rows. Only unknown folders fall back to a rescan."""
+        if not event.is_directory or not event.dest_path:
+            return
+        if event.is_synthetic:
+            # Sub-folder moves synthesized after a directory move: move_folder
+            # has already rewritten everything below the moved directory
+            return
+        
+        src_path = Path(event.src_path)
+        dest_path = Path(event.dest_path)
+        
+        if not self._is_within_music_root(dest_path.resolve()):
+            self._handle_removal(src_path)
+            return
+        
+        try:
+            moved = self.db.move_folder(str(src_path), str(dest_path))
+        except Exception as e:
+            print(f"Error updating moved folder {src_path} -> {dest_path}: {e}")
+            moved = 0
+        
+        if moved > 0:
+            print(f"Album folder moved: {src_path.name} -> {dest_path.name} ({moved} album(s) updated)")
+        elif moved < 0:
+            # Destination already known; the old rows are now stale
+            self._handle_removal(src_path)
+        else:
+            self._handle_change(dest_path)
+    
+    def on_deleted(self, event):
+        """Handle file/directory deletion events"""
+        # Deleted directories are not always reported as such (the path is gone
+        # by the time the event is built), so every deletion is checked. Plain
+        # files never match a stored folder_path, making this a cheap no-op.
+        self._handle_removal(Path(event.src_path))
+    
+    def _handle_removal(self, path: Path):
+        """Remove albums stored at or below a path that no longer exists"""
+        try:
+            deleted = self.db.delete_folder(str(path))
+            if deleted > 0:
+                print(f"Album folder removed: {path.name} ({deleted} album(s) deleted)")
+        except Exception as e:
+            print(f"Error removing albums under {path}: {e}")
     
     def _handle_change(self, path: Path):
         """Handle a filesystem change"""
@@ -104,13 +147,20 @@ class AlbumWatcher(FileSystemEventHandler):
             
             with self.scan_lock:
                 if self.changes_detected and (time.time() - self.last_change_time) >= self.scan_delay:
+                    music_root = str(self.music_root)
+                    if is_scan_active(music_root):
+                        # A scan of this root is running (e.g. resumed at startup);
+                        # keep the changes pending and scan once it has finished
+                        continue
+                    
                     print(f"\n{'='*60}")
                     print("AUTO-SCANNING: Detected new albums in music library...")
                     print(f"{'='*60}")
                     
-                    # Perform incremental scan
-                    scanner = MusicScanner(str(self.music_root), self.db)
-                    added, skipped = scanner.scan()
+                    # Perform incremental scan, continuing an interrupted one if it left a checkpoint
+                    scanner = MusicScanner(music_root, self.db)
+                    resume = self.db.get_scan_checkpoint(music_root) is not None
+                    added, skipped = scanner.scan(resume=resume) or (0, 0)
                     
                     if added > 0:
                         print(f"✓ Auto-added {added} new album(s)")